@@ -0,0 +1,103 @@
+# Compares RTE event throughput across event loop choices.
+#
+# A local websocket server streams synthetic COMMENT_NEW events and a Bot consumes them through
+# the same path as Bot.start (recv, json decode, Comment, dispatch to a coroutine handler).
+# No rtwalk server is needed.
+#
+#   python benchmarks/loop_throughput.py [events]
+
+import asyncio
+import json
+import sys
+import time
+
+import websockets
+
+# Only here to resolve import issues
+__import__("sys").path.append(".")
+
+from rtlink import Bot  # noqa: E402
+from rtlink.types import Comment  # noqa: E402
+from rtlink.utils import get_loop_factory, run  # noqa: E402
+
+
+def make_event(i: int) -> str:
+    # IDs must be unique, the bot skips comments it has already seen
+    return json.dumps(
+        {
+            "event": "COMMENT_NEW",
+            "item": {
+                "id": f"c{i}",
+                "content": "just a comment, not a command",
+                "commenter_id": "u",
+                "reply_to": None,
+                "post_id": "p",
+                "forum_id": "f",
+                "commenter": None,
+                "created_at": 0,
+                "modified_at": 0,
+                "reply_count": 0,
+                "upvotes": 0,
+                "downvotes": 0,
+                "upvoted_by": [],
+                "downvoted_by": [],
+            },
+        }
+    )
+
+
+async def measure(events: int) -> float:
+    payloads = [make_event(i) for i in range(events)]
+
+    async def produce(ws, path=None):
+        for payload in payloads:
+            await ws.send(payload)
+        await ws.wait_closed()
+
+    bot = Bot()
+    bot.user = type("User", (), {"username": "bench"})()
+    handled = 0
+    done = asyncio.Event()
+
+    @bot.on_event("comment")
+    async def on_comment(comment: Comment):
+        nonlocal handled
+        handled += 1
+        if handled == events:
+            done.set()
+
+    async with websockets.serve(produce, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+            start = time.perf_counter()
+            for _ in range(events):
+                bot._handle_event(json.loads(await ws.recv()))
+            await done.wait()
+            elapsed = time.perf_counter() - start
+    bot._shutdown_executors()
+    return events / elapsed
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    configs = [
+        ("asyncio", dict(eager_tasks=False)),
+        ("asyncio + eager tasks", dict(eager_tasks=True)),
+    ]
+    if get_loop_factory(True) is not None:
+        configs.append(("uvloop", dict(use_uvloop=True, eager_tasks=False)))
+        configs.append(
+            ("uvloop + eager tasks", dict(use_uvloop=True, eager_tasks=True))
+        )
+
+    print(f"{events} events, Python {sys.version.split()[0]}")
+    for name, options in configs:
+        if options.get("eager_tasks") and not hasattr(asyncio, "eager_task_factory"):
+            print(f"{name:<24} skipped (needs Python 3.12+)")
+            continue
+        rate = max(run(measure(events), **options) for _ in range(3))
+        print(f"{name:<24} {rate:>10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
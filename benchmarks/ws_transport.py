@@ -0,0 +1,140 @@
+# Measures the effect of WebsocketOptions against a local websocket server.
+#
+# The server streams synthetic COMMENT_NEW events through a byte counting TCP proxy, so the
+# numbers include the real framing and compression overhead.
+#
+#   python benchmarks/ws_transport.py [events]
+
+import asyncio
+import json
+import random
+import statistics
+import string
+import sys
+import time
+
+import websockets
+
+# Only here to resolve import issues
+__import__("sys").path.append(".")
+
+from rtlink.options import WebsocketOptions  # noqa: E402
+
+WORDS = [
+    "".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9)))
+    for _ in range(400)
+]
+
+
+def make_event(i: int) -> str:
+    return json.dumps(
+        {
+            "event": "COMMENT_NEW",
+            "item": {
+                "id": f"655f1c9e2a{i:014d}",
+                "content": " ".join(random.choices(WORDS, k=random.randint(5, 60))),
+                "commenter_id": "655f1c9e2a8b7c0012345678",
+                "reply_to": None,
+                "post_id": f"655f1c9e2a8b7c00123{i % 50:05d}",
+                "forum_id": "655f1c9e2a8b7c0012300001",
+                "commenter": None,
+                "created_at": 1700000000 + i,
+                "modified_at": 1700000000 + i,
+                "reply_count": 0,
+                "upvotes": 0,
+                "downvotes": 0,
+                "upvoted_by": [],
+                "downvoted_by": [],
+            },
+        }
+    )
+
+
+class CountingProxy:
+    def __init__(self, target_port: int):
+        self.target_port = target_port
+        self.downstream = 0
+
+    async def handle(self, reader, writer):
+        up_reader, up_writer = await asyncio.open_connection(
+            "127.0.0.1", self.target_port
+        )
+
+        async def pipe(src, dst, count):
+            while data := await src.read(65536):
+                if count:
+                    self.downstream += len(data)
+                dst.write(data)
+                await dst.drain()
+            dst.close()
+
+        await asyncio.gather(
+            pipe(reader, up_writer, False),
+            pipe(up_reader, writer, True),
+            return_exceptions=True,
+        )
+
+
+async def run_case(payloads, options: WebsocketOptions, work: float = 0):
+    async def produce(ws, path=None):
+        for payload in payloads:
+            await ws.send(payload)
+        await ws.wait_closed()
+
+    async with websockets.serve(produce, "127.0.0.1", 0) as server:
+        proxy = CountingProxy(server.sockets[0].getsockname()[1])
+        proxy_server = await asyncio.start_server(proxy.handle, "127.0.0.1", 0)
+        port = proxy_server.sockets[0].getsockname()[1]
+        async with websockets.connect(
+            f"ws://127.0.0.1:{port}", **options.connect_kwargs()
+        ) as ws:
+            options.apply(ws)
+            max_buffered = 0
+            start = time.perf_counter()
+            for _ in payloads:
+                json.loads(await ws.recv())
+                max_buffered = max(max_buffered, len(ws.messages))
+                if work:
+                    # Simulates handler work that doesn't yield to the loop
+                    end = time.perf_counter() + work
+                    while time.perf_counter() < end:
+                        pass
+            elapsed = time.perf_counter() - start
+            rtts = []
+            for _ in range(50):
+                t = time.perf_counter()
+                await (await ws.ping())
+                rtts.append((time.perf_counter() - t) * 1e6)
+        proxy_server.close()
+    return (
+        len(payloads) / elapsed,
+        proxy.downstream / len(payloads),
+        max_buffered,
+        statistics.median(rtts),
+    )
+
+
+async def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    payloads = [make_event(i) for i in range(events)]
+    raw = sum(len(p) for p in payloads) / events
+    print(f"{events} events, {raw:.0f} bytes of JSON per event on average")
+    print(
+        f"{'case':<34}{'events/s':>10}{'wire B/ev':>11}{'max queued':>12}{'ping us':>9}"
+    )
+    cases = [
+        ("defaults (deflate, window 15)", WebsocketOptions(), 0),
+        ("compression off", WebsocketOptions(compression=False), 0),
+        ("deflate, window 9", WebsocketOptions(max_window_bits=9), 0),
+        ("slow handler, max_queue=32", WebsocketOptions(), 50e-6),
+        ("slow handler, max_queue=4", WebsocketOptions(max_queue=4), 50e-6),
+        ("slow handler, max_queue=256", WebsocketOptions(max_queue=256), 50e-6),
+        ("tcp_nodelay off", WebsocketOptions(tcp_nodelay=False), 0),
+    ]
+    for name, options, work in cases:
+        rate, wire, buffered, rtt = await run_case(payloads, options, work)
+        print(f"{name:<34}{rate:>10,.0f}{wire:>11.0f}{buffered:>12}{rtt:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -18,7 +18,8 @@ bot = Bot(api_url="http://localhost:3758/api/v1/")
 async def login_event():
     # This event is fired just after the bot logs into rtwalk.
     # There can be multiple listeners which will be run concurrently.
-    # Callbacks can also be non-coro in which case they are called in asyncio.to_thead.
+    # Callbacks can also be non-coro in which case they run in the bot's thread pool
+    # (sized with `Bot(thread_workers=...)`).
     print("Do something like database initialization here")
 
 
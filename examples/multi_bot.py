@@ -0,0 +1,32 @@
+# Example of running several bot accounts in one process
+
+import os
+
+# Only here to resolve import issues, exclude in your app
+__import__("sys").path.append("../rtlink/")
+
+from rtlink import Bot, BotRunner, Ctx  # noqa: E402 (ignore this)
+
+# Each bot still logs in with its own account and keeps its own cookies
+greeter = Bot(api_url="http://localhost:3758/api/v1/")
+moderator = Bot(api_url="http://localhost:3758/api/v1/")
+
+
+@greeter.command()
+async def hello(ctx: Ctx):
+    """Says hello."""
+    await ctx.reply("Hello!")
+
+
+@moderator.command()
+async def rules(ctx: Ctx):
+    """Links the forum rules."""
+    await ctx.reply("Be nice.")
+
+
+# The runner hosts both bots in one event loop with one connection pool,
+# one copy of the GraphQL schema and one forum cache.
+runner = BotRunner()
+runner.add(greeter, os.getenv("GREETER_TOKEN"))
+runner.add(moderator, os.getenv("MODERATOR_TOKEN"))
+runner.run()
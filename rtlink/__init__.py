@@ -11,5 +11,15 @@ __path__ = __import__("pkgutil").extend_path(__path__, __name__)
 
 from .http import HTTPClient as RtWalk
 from .bot import Bot
-from .types import User, Forum, File, Comment
+from .types import User, Forum, File, Comment, Post
 from .commands import Ctx
+from .ratelimit import RateLimit, InboundRateLimiter
+from .overload import OverloadController
+from .runner import BotRunner, SharedResources
+from .sharding import ShardedRunner
+from .options import WebsocketOptions
+from .resilience import RetryPolicy, CircuitBreaker
+from .prefetch import Prefetcher
+from .metrics import Metrics
+from .threads import ThreadIndex
+from .scheduler import Scheduler, Timer
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any, Collection, Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from aiohttp.client_exceptions import ClientResponseError
+from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.exceptions import (
+    TransportClosed,
+    TransportProtocolError,
+    TransportServerError,
+)
+from graphql import DocumentNode, ExecutionResult, OperationDefinitionNode, print_ast
+
+logger = logging.getLogger(__name__)
+
+_NOT_FOUND = ("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+_NOT_SUPPORTED = ("PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+
+
+def _error_codes(result: ExecutionResult) -> Tuple[str, ...]:
+    codes = []
+    for error in result.errors or []:
+        if isinstance(error, dict):
+            codes.append(error.get("message", ""))
+            codes.append((error.get("extensions") or {}).get("code", ""))
+    return tuple(codes)
+
+
+class _PreparedQuery:
+    __slots__ = ("text", "sha256", "root_field", "is_query")
+
+    def __init__(self, document: DocumentNode):
+        self.text = print_ast(document)
+        self.sha256 = hashlib.sha256(self.text.encode()).hexdigest()
+        operation = next(
+            d for d in document.definitions if isinstance(d, OperationDefinitionNode)
+        )
+        self.is_query = operation.operation.value == "query"
+        self.root_field = operation.selection_set.selections[0].name.value  # type: ignore
+
+
+class PersistedQueryTransport(AIOHTTPTransport):
+    """An aiohttp transport speaking the automatic persisted query protocol.
+
+    Requests only carry the SHA-256 hash of the document. When the server answers with
+    `PersistedQueryNotFound` the request is repeated once with the full text, which the server
+    then stores under that hash. If the server says persisted queries aren't supported the
+    transport falls back to plain requests for good.
+
+    Args:
+        url: The GraphQL endpoint.
+        get_operations: Root fields of queries that are sent as GET requests, so that they can be
+            cached by HTTP caches in front of the server.
+    """
+
+    def __init__(self, url: str, get_operations: Collection[str] = (), **kwargs: Any):
+        super().__init__(url, **kwargs)
+        self.get_operations = frozenset(get_operations)
+        self.enabled = True
+        self._prepared: WeakKeyDictionary[
+            DocumentNode, _PreparedQuery
+        ] = WeakKeyDictionary()
+
+    def _prepare(self, document: DocumentNode) -> _PreparedQuery:
+        # Printing and hashing happens once per document, not once per request
+        if (prepared := self._prepared.get(document)) is None:
+            prepared = self._prepared[document] = _PreparedQuery(document)
+        return prepared
+
+    async def execute(
+        self,
+        document: DocumentNode,
+        variable_values: Optional[Dict[str, Any]] = None,
+        operation_name: Optional[str] = None,
+        extra_args: Optional[Dict[str, Any]] = None,
+        upload_files: bool = False,
+    ) -> ExecutionResult:
+        if upload_files or not self.enabled:
+            return await super().execute(
+                document, variable_values, operation_name, extra_args, upload_files
+            )
+
+        prepared = self._prepare(document)
+        payload: Dict[str, Any] = {
+            "extensions": {
+                "persistedQuery": {"version": 1, "sha256Hash": prepared.sha256}
+            }
+        }
+        if operation_name:
+            payload["operationName"] = operation_name
+        if variable_values:
+            payload["variables"] = variable_values
+        use_get = prepared.is_query and prepared.root_field in self.get_operations
+
+        result = await self._request(payload, use_get, extra_args)
+        codes = _error_codes(result)
+        if any(code in _NOT_SUPPORTED for code in codes):
+            logger.info("Server does not support persisted queries, disabling them")
+            self.enabled = False
+        elif not any(code in _NOT_FOUND for code in codes):
+            return result
+
+        logger.debug("Registering persisted query %s", prepared.sha256)
+        payload["query"] = prepared.text
+        if not self.enabled:
+            del payload["extensions"]
+        return await self._request(payload, use_get, extra_args)
+
+    async def _request(
+        self,
+        payload: Dict[str, Any],
+        use_get: bool,
+        extra_args: Optional[Dict[str, Any]],
+    ) -> ExecutionResult:
+        if self.session is None:
+            raise TransportClosed("Transport is not connected")
+
+        if use_get:
+            # GET requests carry everything in the query string
+            params = {
+                k: v if isinstance(v, str) else self.json_serialize(v)
+                for k, v in payload.items()
+            }
+            request = self.session.get(
+                self.url, ssl=self.ssl, params=params, **(extra_args or {})
+            )
+        else:
+            request = self.session.post(
+                self.url, ssl=self.ssl, json=payload, **(extra_args or {})
+            )
+
+        async with request as resp:
+            try:
+                result = await resp.json(content_type=None)
+            except (json.JSONDecodeError, ValueError):
+                result = None
+            if not isinstance(result, dict) or (
+                "errors" not in result and "data" not in result
+            ):
+                try:
+                    resp.raise_for_status()
+                except ClientResponseError as e:
+                    raise TransportServerError(str(e), e.status) from e
+                raise TransportProtocolError(
+                    "Server did not return a GraphQL result: {}".format(
+                        await resp.text()
+                    )
+                )
+            self.response_headers = resp.headers
+            return ExecutionResult(
+                errors=result.get("errors"),
+                data=result.get("data"),
+                extensions=result.get("extensions"),
+            )
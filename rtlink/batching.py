@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from gql import gql
+from graphql import DocumentNode
+from gql.transport.exceptions import TransportQueryError
+
+from .errors import TransportQueryError as _TransportQueryError
+from .queries import COMMENT_PROFILES
+from .types import Comment
+
+if TYPE_CHECKING:
+    from .http import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=256)
+def _batch_document(profiles: Tuple[str, ...]) -> DocumentNode:
+    # The document only depends on the field profile of each alias, so it is parsed once
+    variables = ", ".join(
+        f"$postId{i}: String!, $content{i}: String!, $replyTo{i}: String"
+        for i in range(len(profiles))
+    )
+    fields = "\n".join(
+        f"c{i}: createComment(postId: $postId{i}, content: $content{i}, replyTo: $replyTo{i}) "
+        f"{{ {COMMENT_PROFILES[profile]} }}"
+        for i, profile in enumerate(profiles)
+    )
+    return gql(f"mutation({variables}) {{ {fields} }}")
+
+
+class _PendingReply:
+    __slots__ = ("post_id", "reply_to", "fields", "contents", "future")
+
+    def __init__(
+        self, post_id: str, reply_to: Optional[str], fields: str, content: str, future
+    ):
+        self.post_id = post_id
+        self.reply_to = reply_to
+        self.fields = fields
+        self.contents = [content]
+        self.future: asyncio.Future[Comment] = future
+
+
+class ReplyQueue:
+    """Collects `createComment` calls for `window` seconds and sends them as one aliased mutation.
+
+    Every caller still gets its own [`Comment`][rtlink.types.Comment] back. With `coalesce`,
+    replies to the same comment that are waiting in the same window are joined into one message
+    and all their callers receive that one comment.
+
+    Args:
+        client: The client used to send the batches.
+        window: Seconds to wait for more comments after the first one is queued.
+        max_batch: A batch is sent right away once it has this many comments.
+        coalesce: Merge pending replies that share a `reply_to`.
+    """
+
+    separator = "\n\n"
+
+    def __init__(
+        self,
+        client: HTTPClient,
+        window: float,
+        max_batch: int = 20,
+        coalesce: bool = False,
+    ):
+        self._client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+        self._pending: List[_PendingReply] = []
+        self._by_target: Dict[Tuple[str, str], _PendingReply] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        post_id: str,
+        content: str,
+        reply_to: Optional[str] = None,
+        fields: str = "full",
+    ) -> Comment:
+        if self.coalesce and reply_to is not None:
+            if pending := self._by_target.get((post_id, reply_to)):
+                pending.contents.append(content)
+                return await asyncio.shield(pending.future)
+
+        loop = asyncio.get_running_loop()
+        pending = _PendingReply(
+            post_id, reply_to, fields, content, loop.create_future()
+        )
+        self._pending.append(pending)
+        if self.coalesce and reply_to is not None:
+            self._by_target[(post_id, reply_to)] = pending
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # Shielded so one caller giving up doesn't cancel a reply others share
+        return await asyncio.shield(pending.future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self._by_target.clear()
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        task.add_done_callback(functools.partial(self._abandon, batch))
+
+    @staticmethod
+    def _abandon(batch: List[_PendingReply], task: asyncio.Task):
+        # A send that was cancelled, e.g. on shutdown, resolves nothing. Its callers must not wait
+        # forever, futures that already have a result are left alone.
+        for pending in batch:
+            pending.future.cancel()
+
+    async def flush(self):
+        """Sends everything queued right away and waits for all in-flight batches."""
+        self._flush()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    async def _send(self, batch: List[_PendingReply]):
+        variables = {}
+        for i, pending in enumerate(batch):
+            variables[f"postId{i}"] = pending.post_id
+            variables[f"content{i}"] = self.separator.join(pending.contents)
+            variables[f"replyTo{i}"] = pending.reply_to
+
+        data: dict = {}
+        error: Optional[Exception] = None
+        try:
+            await self._client._throttle_mutation(len(batch))
+            data = await self._client._execute(
+                _batch_document(tuple(pending.fields for pending in batch)),
+                variables,
+            )
+        except TransportQueryError as e:
+            # Errors are per field, the comments that did get created are still in e.data
+            logger.error(e)
+            data = e.data or {}
+            error = _TransportQueryError(e)
+        except Exception as e:
+            error = e
+        logger.debug("Sent %d comments in one request", len(batch))
+
+        for i, pending in enumerate(batch):
+            if pending.future.done():
+                continue
+            if res := data.get(f"c{i}"):
+                pending.future.set_result(self._client._new_comment(res))
+            else:
+                pending.future.set_exception(
+                    error or RuntimeError("Comment was not created")
+                )
+                pending.future.exception()  # Mark as retrieved
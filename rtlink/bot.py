@@ -1,15 +1,46 @@
 import asyncio
-from typing import Optional, Dict, List, Coroutine, TypeVar, Union, Callable, Any
+import contextvars
+import functools
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Optional,
+    Pattern,
+    Sequence,
+    Dict,
+    List,
+    Set,
+    Coroutine,
+    TypeVar,
+    Union,
+    Callable,
+    Any,
+)
 import json
+import os
+import signal
 import time
 import logging
+from collections import OrderedDict
+from datetime import datetime
+from contextlib import suppress
 
 from .http import HTTPClient
 from .types import Comment, User, Forum
-from .utils import setup_logging
+from .metrics import Metrics
+from .prefetch import Prefetcher
+from .threads import ThreadIndex
+from .triggers import TriggerSet, make_trigger
+from .scheduler import Scheduler, Timer
+from .utils import setup_logging, run as _run
 from .commands import Command, CommandManager, help_command
+from .extensions import Extensions
+from .ratelimit import InboundRateLimiter
+from .overload import OverloadController
+from .options import WebsocketOptions
+from .sharding import _PostOrder
 
 from websockets.client import connect
+from websockets.exceptions import ConnectionClosed
 
 
 T = TypeVar("T")
@@ -25,9 +56,36 @@ class Bot:
         api_url: Url of the rtwalk server.
         client (rtlink.http.HTTPClient): A http client that maintains the API connection.
         loop: Asyncio event loop.
+        thread_workers: Size of the thread pool used for non-coroutine event handlers and commands.
+            Defaults to the `ThreadPoolExecutor` default.
+        process_workers: Size of the process pool used by commands registered with
+            `executor="process"`. The pool is only created when such a command first runs.
+        rate_limiter: Limits how often commands are processed per user, per post and globally.
+            Comments over the limit dispatch a `rate_limited` event instead.
+        drain_timeout: On shutdown, seconds to wait for running handlers and queued replies before
+            they are cancelled.
+        handoff_path: Path of a Unix socket used to hand the RTE stream over between an old and a
+            new process of the same bot. A starting bot connects to the RTE first, then asks the
+            running one to stop consuming and skips every comment that one already took. A
+            running process that doesn't answer within `drain_timeout` seconds is ignored.
+        ws_options: Transport settings for the RTE websocket, also the default for VC connections.
+        session_file: Where to keep the session cookies between runs. A restart resumes the saved
+            session instead of logging in again, and shutdown saves it instead of logging out.
+            Only point this at a file other users can't write to.
+        overload: Sheds work when the bot falls behind the RTE stream, skipping `comment` listeners
+            and dropping stale commands.
+        prefetch: Looks up the forum and parent of new comments before their handlers run.
+        threads: Index of recent comments and their reply links, fed by the RTE stream.
+        timers_file: Where pending timers scheduled with `persist=True` are saved on shutdown and
+            restored from on start.
+        max_pending: RTE events queued or being handled at once. When reached the bot stops
+            reading the websocket until a handler finishes. Events of one post are handled one
+            at a time, in the order they arrived.
 
     Attributes:
         user (rtlink.types.User): The bot user. Only available after login.
+        metrics (rtlink.metrics.Metrics): Counters and gauges of this bot.
+        threads (rtlink.threads.ThreadIndex): The `threads` index, if one was passed.
     """
 
     def __init__(
@@ -35,6 +93,18 @@ class Bot:
         api_url: Optional[str] = "http://localhost:3758/api/v1",
         client: Optional[HTTPClient] = None,
         loop: Optional[asyncio.AbstractEventLoop] = None,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        rate_limiter: Optional[InboundRateLimiter] = None,
+        drain_timeout: float = 10,
+        handoff_path: Optional[str] = None,
+        ws_options: Optional[WebsocketOptions] = None,
+        overload: Optional[OverloadController] = None,
+        session_file: Optional[str] = None,
+        prefetch: Optional[Prefetcher] = None,
+        threads: Optional[ThreadIndex] = None,
+        timers_file: Optional[str] = None,
+        max_pending: int = 256,
     ) -> None:
         setup_logging()
         self._client: HTTPClient = client or HTTPClient(
@@ -48,11 +118,41 @@ class Bot:
             "post": False,
             "post_edit": False,
         }
-
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=thread_workers, thread_name_prefix="rtlink-worker"
+        )
+        self._process_workers = process_workers
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._order = _PostOrder(self, max_pending)
+        self.rate_limiter = rate_limiter
+        self.overload = overload
+        self.session_file = session_file
+        self.metrics = Metrics()
+        self.prefetcher = prefetch
+        if prefetch is not None:
+            prefetch._set_bot(self)
+        self.threads = threads
+        if threads is not None:
+            threads._set_bot(self)
+        self.drain_timeout = drain_timeout
+        self.ws_options = ws_options or WebsocketOptions()
+        self.handoff_path = handoff_path
+        self._handoff_server: Optional[asyncio.AbstractServer] = None
+        # Bounded set of recently handled comment IDs, passed on during a handoff
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._vc_clients: Set[Any] = set()
+        self.triggers = TriggerSet()
+        self.scheduler = Scheduler(self)
+        self.timers_file = timers_file
+        self._loops: List[Dict[str, Any]] = []
+
+        self.extensions = Extensions(self)
         self.command_manager = CommandManager()
         self.command_manager._set_bot(self)
         self.command_manager.add_command(Command(help_command, "help"))
-        asyncio.set_event_loop(loop)
+        if loop is not None:
+            asyncio.set_event_loop(loop)
 
     def is_closed(self) -> bool:
         """Check if the RTE connection has closed. Implies the bot has logged out.
@@ -73,47 +173,230 @@ class Bot:
         Args:
             token (string): Your bot token
         """
-        email, password = token.split("@")
+        self.ws = ws = await self._login(token)
+        try:
+            logger.info("Listening to RTE websocket at {}".format(self.rte_url))
+            self._spawn(self._log_latency(ws))
+            if self.handoff_path:
+                # Events queue up in the websocket until the old process has let go
+                await self._take_over()
+                await self._serve_handoff()
+            while not self.is_closed():
+                try:
+                    msg = json.loads(await ws.recv())
+                    if self.is_closed():
+                        break
+                    # Waits while the bot is behind, events then queue up in the websocket
+                    await self._order.submit(msg)
+                except (asyncio.CancelledError, ConnectionClosed):
+                    logger.info("Disconnecting from RTE websocket")
+                    break
+        except KeyboardInterrupt:
+            logger.info("Received keyboard interrupt, logging out")
+        finally:
+            await ws.close()
+        await self._shutdown()
+
+    def stop(self):
+        """Stops consuming RTE events. [`Bot.start`][rtlink.bot.Bot.start] then drains running
+        handlers and queued replies for up to `drain_timeout` seconds and logs out."""
+        if self._closed:
+            return
+        self._closed = True
+        if ws := getattr(self, "ws", None):
+            self._spawn(ws.close())
+
+    async def _take_over(self):
+        try:
+            # The list of seen comments is sent as one line, longer than the default limit
+            reader, writer = await asyncio.open_unix_connection(
+                self.handoff_path, limit=2**24
+            )
+        except (FileNotFoundError, ConnectionRefusedError):
+            return
+        logger.info("Taking over the RTE stream from the running process")
+        try:
+            # A process that hangs mid handoff must not keep this one from starting
+            async with asyncio.timeout(self.drain_timeout):
+                writer.write(b"HANDOFF\n")
+                await writer.drain()
+                line = await reader.readline()
+            self._mark_seen(json.loads(line))
+        except (TimeoutError, ConnectionError, ValueError) as e:
+            logger.warn(
+                "Handoff from the running process failed, starting normally: {!r}".format(
+                    e
+                )
+            )
+        finally:
+            writer.close()
+
+    async def _serve_handoff(self):
+        with suppress(FileNotFoundError):
+            os.unlink(self.handoff_path)  # type: ignore
+        self._handoff_server = await asyncio.start_unix_server(
+            self._on_handoff, self.handoff_path
+        )
+
+    async def _on_handoff(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            async with asyncio.timeout(self.drain_timeout):
+                request = await reader.readline()
+        except (TimeoutError, ConnectionError):
+            request = b""
+        if not request:
+            writer.close()
+            return
+        logger.info("A new process is taking over, draining")
+        # Stop first so the list of seen comments can't grow after it is sent
+        self.stop()
+        writer.write(json.dumps(list(self._seen)).encode() + b"\n")
+        await writer.drain()
+        writer.close()
+        if self._handoff_server is not None:
+            self._handoff_server.close()
+            self._handoff_server = None
+
+    def _mark_seen(self, ids: List[str], maxlen: int = 10_000):
+        for id in ids:
+            self._seen[id] = None
+        while len(self._seen) > maxlen:
+            self._seen.popitem(last=False)
+
+    async def _connect_rte(self):
         await self._validate_and_set_api_info()
+        ws = await connect(self._rte_endpoint(), **self.ws_options.connect_kwargs())
+        self.ws_options.apply(ws)
+        return ws
+
+    async def _login(self, token: str, rte: bool = True) -> Any:
+        """Logs in and runs the login hooks. With `rte` the RTE websocket is connected too and
+        returned, sharded workers get their events from the ingest process instead."""
+        # The RTE socket doesn't need the session, connect to it while logging in
+        results = await asyncio.gather(
+            self._authenticate(token),
+            self._connect_rte() if rte else self._validate_and_set_api_info(),
+            return_exceptions=True,
+        )
+        ws = results[1] if rte else None
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            await self._logged_in()
+        except BaseException:
+            if ws is not None and not isinstance(ws, BaseException):
+                await ws.close()
+            raise
+        return ws
+
+    async def _authenticate(self, token: str):
+        if self.session_file and await self._client.resume_session(self.session_file):
+            logger.info("Resumed saved session from {}".format(self.session_file))
+            return
+        email, password = token.split("@")
         await self._client.login(email, password)
+
+    async def _logged_in(self):
         logger.info(
             f"Bot logged in to {self._client.api_url} (Username: {self._client.user.username})"
         )
-        logger.debug(f"Self: {self._client.user}")
+        logger.debug("Self: %s", self._client.user)
         self.user: User = self._client.user
         self.command_manager.prog = f"@{self.user.username}"
+        self.command_manager.invalidate_help()
+        self._start_scheduler()
         await self._on_login()
-        try:
-            async with connect(
-                "{}?comment_new={}&comment_edit={}&post_new={}&post_edit={}".format(
-                    self.rte_url,
-                    self._rte_options["comment"],
-                    self._rte_options["comment_edit"],
-                    self._rte_options["post"],
-                    self._rte_options["post_edit"],
-                )
-            ) as ws:
-                self.ws = ws
-                logger.info("Listening to RTE websocket at {}".format(self.rte_url))
-                logger.info(
-                    f"RTE websocket latency: {(await self._calc_latency_ms(ws)):.2f}ms"
+
+    def _start_scheduler(self):
+        if self.timers_file:
+            self.scheduler.load(self.timers_file)
+        for loop in self._loops:
+            self.scheduler.add(
+                time.time() + (0 if loop.pop("immediate") else loop["interval"]),
+                loop.pop("fn"),
+                **loop,
+            )
+        self._loops.clear()
+        self.scheduler.start()
+
+    def _rte_endpoint(self) -> str:
+        return "{}?comment_new={}&comment_edit={}&post_new={}&post_edit={}".format(
+            self.rte_url,
+            self._rte_options["comment"],
+            self._rte_options["comment_edit"],
+            self._rte_options["post"],
+            self._rte_options["post_edit"],
+        )
+
+    def _handle_event(self, msg: dict) -> Optional[asyncio.Task]:
+        logger.debug("RTE Event: %s", msg)
+        if msg["event"] == "COMMENT_NEW":
+            if msg["item"]["id"] in self._seen:
+                logger.debug("Skipping already handled comment %s", msg["item"]["id"])
+                return None
+            self._mark_seen([msg["item"]["id"]])
+            cmnt = Comment(**msg["item"])
+            cmnt._client = self._client
+            if self.threads is not None:
+                self.threads.add(cmnt)
+            if self.prefetcher:
+                self.prefetcher.prefetch(cmnt)
+            return self._spawn(self._on_comment(cmnt))
+        return None
+
+    async def _shutdown(self):
+        self._closed = True
+        if self._handoff_server is not None:
+            self._handoff_server.close()
+            with suppress(FileNotFoundError):
+                os.unlink(self.handoff_path)  # type: ignore
+        await self.scheduler.stop()
+        if self.timers_file:
+            self.scheduler.save(self.timers_file)
+        # Drain: in-flight handlers first since they may still queue replies
+        deadline = time.monotonic() + self.drain_timeout
+        if self._tasks:
+            logger.info("Waiting for %d running handlers", len(self._tasks))
+            await asyncio.wait(self._tasks, timeout=self.drain_timeout)
+        if self._client._reply_queue is not None:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._client._reply_queue.flush(),
+                    max(deadline - time.monotonic(), 0),
                 )
-                while not self.is_closed():
-                    try:
-                        msg = json.loads(await ws.recv())
-                    except asyncio.CancelledError:
-                        logger.info("Disconnecting from RTE websocket")
-                        break
-                    logger.debug("RTE Event: {}".format(msg))
-                    if msg["event"] == "COMMENT_NEW":
-                        cmnt = Comment(**msg["item"])
-                        cmnt._client = self._client
-                        await self._on_comment(cmnt)
-        except KeyboardInterrupt:
-            logger.info("Received keyboard interrupt, logging out")
-        await self._client.logout()
+        for task in self._tasks:
+            task.cancel()
+        if self.prefetcher:
+            self.prefetcher.cancel()
+        for vc in list(self._vc_clients):
+            await vc.close()
+        if self.session_file:
+            # Keep the session alive on the server so the next run can resume it
+            self._client.save_session(self.session_file)
+        else:
+            await self._client.logout()
+        await self._client.close()
         logger.info("Bot has logged out")
         await self._on_logout()
+        self._shutdown_executors()
+
+    def _spawn(self, coro: Coro[Any]) -> asyncio.Task:
+        # Keeps a strong reference so handlers aren't garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and (e := task.exception()):
+            logger.error("Unhandled exception in event handler", exc_info=e)
+
+    async def _log_latency(self, ws):
+        logger.info(f"RTE websocket latency: {(await self._calc_latency_ms(ws)):.2f}ms")
 
     async def _calc_latency_ms(self, ws):
         t1 = time.time()
@@ -133,13 +416,80 @@ class Bot:
         """
         return await self._calc_latency_ms(self.ws)
 
-    def run(self, token: str):
+    def run(
+        self,
+        token: str,
+        *,
+        use_uvloop: bool = False,
+        loop_factory: Optional[Callable[[], asyncio.AbstractEventLoop]] = None,
+        debug: Optional[bool] = None,
+        eager_tasks: bool = True,
+        default_executor_workers: Optional[int] = None,
+    ):
         """
         Blocking call to start the bot. Use [`Bot.start`][rtlink.bot.Bot.start] for a nonblocking call.
 
-        This is equivalent to calling `asyncio.run(bot.start(token))`
+        This is equivalent to calling `asyncio.run(bot.start(token))`, with SIGTERM also stopping
+        the bot gracefully. The keyword arguments configure the event loop, see
+        [`rtlink.utils.run`][rtlink.utils.run].
+
+        Args:
+            token (string): Your bot token
+            use_uvloop: Run on uvloop when it is installed.
+            loop_factory: Callable returning the event loop to use. Overrides `use_uvloop`.
+            debug: Turns on asyncio debug mode.
+            eager_tasks: Use eager tasks on Python 3.12+.
+            default_executor_workers: Size of the loop's default executor.
+        """
+
+        async def main():
+            with suppress(NotImplementedError):
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.stop)
+            await self.start(token)
+
+        _run(
+            main(),
+            use_uvloop=use_uvloop,
+            loop_factory=loop_factory,
+            debug=debug,
+            eager_tasks=eager_tasks,
+            default_executor_workers=default_executor_workers,
+        )
+
+    def _get_executor(self, kind: str) -> Executor:
+        if kind == "process":
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._process_workers
+                )
+            return self._process_pool
+        return self._thread_pool
+
+    def _shutdown_executors(self):
+        self._thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run_in_executor(
+        self, fn: Callable[..., T], *args, executor: str = "thread", **kwargs
+    ) -> T:
+        """Runs a blocking callable in one of the bot's executors.
+
+        Args:
+            fn: The callable. Must be picklable, along with its arguments, for the process executor.
+            executor: Either `"thread"` or `"process"`.
+
+        Returns:
+            The return value of `fn`.
         """
-        asyncio.run(self.start(token))
+        loop = asyncio.get_running_loop()
+        if executor == "process":
+            call = functools.partial(fn, *args, **kwargs)
+        else:
+            # Same as asyncio.to_thread, keep contextvars visible to the handler
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, fn, *args, **kwargs)
+        return await loop.run_in_executor(self._get_executor(executor), call)
 
     def on_event(self, name: str):
         def __dec(fn):
@@ -152,10 +502,161 @@ class Bot:
 
         return __dec
 
-    def command(self, name: Optional[str] = None, aliases: List[str] = []):
+    def trigger(
+        self,
+        *keywords: str,
+        regex: Union[str, Pattern, Sequence[Union[str, Pattern]]] = (),
+        case_sensitive: bool = False,
+        word: bool = True,
+    ):
+        """Registers a handler for comments containing any of `keywords` or matching any of
+        `regex`. The handler is called as `fn(comment, match)` with the matching keyword, or the
+        `re.Match` for regexes, and only for comments that match. All triggers are compiled into
+        one matcher that scans each comment once. The bot's own comments never fire triggers.
+
+        ```py
+        @bot.trigger("hello", "hi", regex=r"good (morning|evening)")
+        async def greet(comment: Comment, match):
+            await comment.reply("Hello!")
+        ```
+
+        Args:
+            keywords: Literal keywords.
+            regex: Regular expressions, as strings or compiled patterns.
+            case_sensitive: Match keywords and string regexes case sensitively.
+            word: Only match keywords at word boundaries.
+        """
+
         def __dec(fn):
             self._rte_options["comment"] = True
-            self.command_manager.add_command(Command(fn, name or fn.__name__, aliases))
+            self.triggers.add(make_trigger(fn, keywords, regex, case_sensitive, word))
+            return fn
+
+        return __dec
+
+    def loop(
+        self,
+        interval: float,
+        *,
+        jitter: float = 0,
+        overlap: str = "skip",
+        immediate: bool = True,
+    ):
+        """Runs the decorated function every `interval` seconds while the bot is logged in.
+
+        ```py
+        @bot.loop(300, jitter=10)
+        async def refresh():
+            ...
+        ```
+
+        Args:
+            interval: Seconds between the starts of two runs.
+            jitter: Up to this many seconds are added to every interval at random, so that
+                several bots don't hit the API at the same moment.
+            overlap: What happens when a run is due while the previous one is still going.
+                `"skip"` drops it, `"queue"` starts it as soon as the previous one ends.
+            immediate: Run once right after login instead of waiting a first interval.
+        """
+        if overlap not in ("skip", "queue"):
+            raise ValueError('Unknown overlap policy "{}"'.format(overlap))
+
+        def __dec(fn):
+            self._loops.append(
+                dict(
+                    fn=fn,
+                    interval=interval,
+                    jitter=jitter,
+                    overlap=overlap,
+                    immediate=immediate,
+                )
+            )
+            return fn
+
+        return __dec
+
+    def schedule_at(
+        self,
+        when: Union[datetime, float],
+        fn: Callable,
+        *args: Any,
+        persist: bool = False,
+    ) -> Timer:
+        """Calls `fn(*args)` at `when`, a datetime or Unix timestamp.
+
+        Args:
+            persist: Save the timer on shutdown and restore it on the next start, needs
+                `timers_file`. `fn` has to be a module level function and `args` JSON
+                serializable.
+
+        Returns:
+            : The timer, call `cancel()` on it to unschedule the call.
+        """
+        return self.scheduler.add(when, fn, *args, persist=persist)
+
+    def schedule_in(
+        self, delay: float, fn: Callable, *args: Any, persist: bool = False
+    ) -> Timer:
+        """Calls `fn(*args)` in `delay` seconds. See
+        [`Bot.schedule_at`][rtlink.bot.Bot.schedule_at]."""
+        return self.scheduler.add(time.time() + delay, fn, *args, persist=persist)
+
+    def remove_trigger(self, fn: Callable):
+        """Unregisters every trigger of a handler."""
+        self.triggers.remove(fn)
+
+    def command(
+        self,
+        name: Optional[str] = None,
+        aliases: List[str] = [],
+        executor: str = "thread",
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        overflow: str = "queue",
+        cache: Optional[float] = None,
+        cache_size: int = 128,
+        max_age: Optional[float] = None,
+    ):
+        """Registers a command.
+
+        Args:
+            name: Name of the command. Defaults to the function name.
+            aliases: Other names the command can be invoked with.
+            executor: Where non-coroutine commands run, `"thread"` or `"process"`. Process commands
+                receive `None` instead of a [`Ctx`][rtlink.commands.Ctx] since it can't be pickled,
+                and a returned string is sent as the reply.
+            max_concurrency: Maximum number of concurrent invocations. Unlimited by default.
+            timeout: Seconds an invocation may run before it is cancelled. Threads and processes
+                can't be interrupted, a sync command that times out keeps its `max_concurrency`
+                slot until it actually returns.
+            overflow: What happens when `max_concurrency` is reached. `"queue"` waits for a slot,
+                `"reject"` replies with a busy message and `"drop"` silently ignores the invocation.
+            cache: Seconds to memoize results for, keyed by the parsed arguments. A cache hit
+                replays the replies sent by the original invocation instead of running the command.
+                Concurrent identical invocations share a single execution.
+            cache_size: Maximum number of memoized argument combinations.
+            max_age: Seconds after which an invocation is too old to answer when the bot has an
+                `overload` controller. Defaults to the controller's `command_max_age`, use
+                `float("inf")` to always answer.
+        """
+
+        def __dec(fn):
+            self._rte_options["comment"] = True
+            self.command_manager.add_command(
+                Command(
+                    fn,
+                    name or fn.__name__,
+                    aliases,
+                    executor=executor,
+                    max_concurrency=max_concurrency,
+                    timeout=timeout,
+                    overflow=overflow,
+                    cache=cache,
+                    cache_size=cache_size,
+                    max_age=max_age,
+                )
+            )
+            return fn
 
         return __dec
 
@@ -166,7 +667,7 @@ class Bot:
                     if asyncio.iscoroutinefunction(fn):
                         tg.create_task(fn(*args, **kwargs))
                     else:
-                        tg.create_task(asyncio.to_thread(fn, *args, **kwargs))
+                        tg.create_task(self.run_in_executor(fn, *args, **kwargs))
 
     async def _on_login(self):
         await self.dispatch("login")
@@ -175,8 +676,22 @@ class Bot:
         await self.dispatch("logout")
 
     async def _on_comment(self, comment: Comment):
-        await self.dispatch("comment", comment)
-        await self.command_manager.try_process_command(comment)
+        age = self.overload.observe(comment) if self.overload else 0
+        if not (self.overload and self.overload.skip_events(age)):
+            await self.dispatch("comment", comment)
+            if self.triggers and comment.commenter_id != self.user.id:
+                await self._run_triggers(comment)
+        await self.command_manager.try_process_command(comment, age)
+
+    async def _run_triggers(self, comment: Comment):
+        if not (matches := self.triggers.match(comment.content)):
+            return
+        async with asyncio.TaskGroup() as tg:
+            for trigger, match in matches:
+                if asyncio.iscoroutinefunction(trigger.fn):
+                    tg.create_task(trigger.fn(comment, match))
+                else:
+                    tg.create_task(self.run_in_executor(trigger.fn, comment, match))
 
     async def fetch_forum(
         self,
@@ -198,15 +713,55 @@ class Bot:
         Returns:
             : The forum/forums to be fetch.
         """
-        if use_cache:
-            if r := await self._client.get_cache(name or id or ids or names):
-                if not isinstance(r, list):
-                    return r
-                elif None not in r:
-                    return r
-        return await self._client.fetch_forum(
-            name=name,
-            id=id,
-            ids=ids,
-            names=names,
+        if not use_cache:
+            return await self._client.fetch_forum(
+                name=name, id=id, ids=ids, names=names
+            )
+        if id or name:
+            return await self._lookup(
+                "forum",
+                id or name,  # type: ignore
+                lambda: self._client.fetch_forum(name=name, id=id),
+            )
+        if r := await self._client.get_cache(ids or names):
+            if None not in r:
+                return r
+        return await self._client.fetch_forum(ids=ids, names=names)
+
+    async def fetch_comment(self, id: str, use_cache: bool = True) -> Optional[Comment]:
+        """Fetches a comment by ID. Checks the cache first and hits the API only when it can't
+        find the comment in cache.
+
+        Args:
+            id: ID of the comment.
+
+        Returns:
+            : The comment, `None` if it doesn't exist.
+        """
+        if not use_cache:
+            return await self._client.fetch_comment(id)
+        return await self._lookup(
+            "comment",
+            id,
+            lambda: self._client.fetch_comment(id),
+            lambda: self._client.get_cached_comment(id),
         )
+
+    async def _lookup(
+        self,
+        kind: str,
+        key: str,
+        fetch: Callable[[], Coro[Any]],
+        cached: Optional[Callable[[], Coro[Any]]] = None,
+    ) -> Any:
+        if r := await (cached() if cached else self._client.get_cache(key)):
+            self.metrics.incr(f"lookup.{kind}.hit")
+            return r
+        if self.prefetcher and (task := self.prefetcher.inflight(kind, key)):
+            self.metrics.incr(f"lookup.{kind}.joined")
+            # A failed prefetch returns None, the caller then fetches on its own
+            if (r := await asyncio.shield(task)) is not None:
+                return r
+        else:
+            self.metrics.incr(f"lookup.{kind}.miss")
+        return await fetch()
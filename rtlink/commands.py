@@ -3,7 +3,10 @@ import argparse
 import shlex
 import logging
 import asyncio
+import contextvars
 import inspect
+import time
+from collections import OrderedDict
 
 from typing import (
     TYPE_CHECKING,
@@ -15,8 +18,9 @@ from typing import (
     Any,
     Callable,
     Dict,
-    Union,
     Sequence,
+    Tuple,
+    Hashable,
 )
 import typing
 
@@ -32,6 +36,11 @@ Coro = Coroutine[Any, Any, T]
 CoroT = Callable[..., Coro[Any]]
 logger = logging.getLogger(__name__)
 
+# Executor calls of the current invocation that outlived it, see CommandManager._call_executor
+_abandoned: contextvars.ContextVar[List[asyncio.Future]] = contextvars.ContextVar(
+    "_abandoned"
+)
+
 
 # Types that define hw to parse arguments
 class Flag:
@@ -46,10 +55,21 @@ class Ctx:
     def __init__(self, bot: Bot, comment: Comment):
         self.bot = bot
         self.comment = comment
-        self.vc = VcClient(bot, bot.vc_url, "dreamh")
+        self._vc: Optional[VcClient] = None
+        # Set by the command manager while running a cached command, `(content, fields)`
+        self._replies: Optional[List[Tuple[str, str]]] = None
 
-    async def reply(self, content: str) -> Comment:
-        return await self.comment.reply(content)
+    @property
+    def vc(self) -> VcClient:
+        # Created on first use, most commands never touch VC
+        if self._vc is None:
+            self._vc = VcClient(self.bot, self.bot.vc_url, "dreamh")
+        return self._vc
+
+    async def reply(self, content: str, fields: str = "full") -> Comment:
+        if self._replies is not None:
+            self._replies.append((content, fields))
+        return await self.comment.reply(content, fields=fields)
 
 
 allowed_annotations = [
@@ -63,11 +83,68 @@ allowed_annotations = [
 ]
 
 
+class ResultCache:
+    """Size bounded LRU of command results that expire after `ttl` seconds.
+    Entries are `(result, replies)` so that a hit can replay the replies the command sent, as
+    `(content, fields)`.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[
+            Hashable, Tuple[float, Any, List[Tuple[str, str]]]
+        ] = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, List[Tuple[str, str]]]]:
+        if entry := self._entries.get(key):
+            expires, result, replies = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                return result, replies
+            del self._entries[key]
+        return None
+
+    def set(self, key: Hashable, result: Any, replies: List[Tuple[str, str]]):
+        self._entries[key] = (time.monotonic() + self.ttl, result, replies)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
 class Command:
-    def __init__(self, fn, name: Optional[str] = None, aliases: List[str] = []):
+    def __init__(
+        self,
+        fn,
+        name: Optional[str] = None,
+        aliases: List[str] = [],
+        executor: str = "thread",
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        overflow: str = "queue",
+        cache: Optional[float] = None,
+        cache_size: int = 128,
+        max_age: Optional[float] = None,
+    ):
         self.name = name or fn.__name__
         self.aliases = aliases
         self.fn = fn
+        self.executor = executor
+        self.timeout = timeout
+        self.overflow = overflow
+        self.max_age = max_age
+        # Import path of the extension that registered the command, see rtlink.extensions
+        self.extension: Optional[str] = None
+        self.semaphore: Optional[asyncio.Semaphore] = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        )
+        self.cache: Optional[ResultCache] = (
+            ResultCache(cache, cache_size) if cache else None
+        )
+
+    def is_saturated(self) -> bool:
+        return self.semaphore is not None and self.semaphore.locked()
 
 
 class JoinAction(argparse.Action):
@@ -93,16 +170,50 @@ class JoinAction(argparse.Action):
 
 
 class CommandManager(argparse.ArgumentParser):
+    busy_message = "`{}` is busy right now, try again in a bit."
+
     def __init__(self, *args, **kwargs):
         super().__init__(exit_on_error=False, *args, **kwargs)
+        self._help_text: Optional[str] = None
+
+    @property
+    def help_text(self) -> str:
+        """The formatted help message. Built once and reused until the commands or prog change."""
+        if self._help_text is None:
+            self._help_text = self.format_help()
+        return self._help_text
+
+    def invalidate_help(self):
+        self._help_text = None
 
     def _set_bot(self, bot: Bot):
         self.signatures: Dict[str, inspect.Signature] = {}
-        self.commands: Dict[str, Union[CoroT, Callable]] = {}
+        self.commands: Dict[str, Command] = {}
         self.subparsers = self.add_subparsers(dest="command")
         self.bot = bot
 
     def add_command(self, command: Command):
+        if command.executor not in ("thread", "process"):
+            logger.error(
+                'Unknown executor "{}" for command: "{}". Skipping.'.format(
+                    command.executor, command.name
+                )
+            )
+            return
+        if command.executor == "process" and asyncio.iscoroutinefunction(command.fn):
+            logger.error(
+                'Command "{}" is a coroutine and can\'t run in a process. Skipping.'.format(
+                    command.name
+                )
+            )
+            return
+        if command.overflow not in ("queue", "reject", "drop"):
+            logger.error(
+                'Unknown overflow policy "{}" for command: "{}". Skipping.'.format(
+                    command.overflow, command.name
+                )
+            )
+            return
         # First parse the command to get arguments
         sig = inspect.signature(command.fn)
         haskeywordonly = False
@@ -143,7 +254,7 @@ class CommandManager(argparse.ArgumentParser):
             )
             return
 
-        self.commands[command.name] = command.fn
+        self.commands[command.name] = command
         self.signatures[command.name] = sig
         try:
             parser = self.subparsers.add_parser(
@@ -152,15 +263,16 @@ class CommandManager(argparse.ArgumentParser):
                 aliases=command.aliases,
             )
             self.add_args(parser, sig, command.name)
+            self.invalidate_help()
             for alias in command.aliases:
                 self.signatures[alias] = sig
-                self.commands[alias] = command.fn
+                self.commands[alias] = command
         except argparse.ArgumentError:
             logger.warn('Overwriting command "{}"'.format(command.name))
             self.remove_command(command.name)
             for alias in command.aliases:
                 self.remove_command(alias)
-                self.commands[alias] = command.fn
+                self.commands[alias] = command
                 self.signatures[alias] = sig
             parser = self.subparsers.add_parser(
                 command.name,
@@ -168,6 +280,7 @@ class CommandManager(argparse.ArgumentParser):
                 aliases=command.aliases,
             )
             self.add_args(parser, sig, command.name)
+            self.invalidate_help()
 
     def add_args(self, parser, sig: inspect.Signature, command_name):
         for i, param in enumerate(sig.parameters.values()):
@@ -245,38 +358,196 @@ class CommandManager(argparse.ArgumentParser):
             return typing.get_args(annotation)[0]
         return annotation
 
-    async def try_process_command(self, comment: Comment) -> Any:
+    async def try_process_command(self, comment: Comment, age: float = 0) -> Any:
         prefix = f"@{self.bot.user.username}"
         if comment.content.startswith(prefix):
             to_parse = comment.content[len(prefix) :]
+            if self.bot.overload and await self._drop_stale(comment, to_parse, age):
+                return
+            # Checked before parsing so that rejected comments cost next to nothing
+            if self.bot.rate_limiter and not self.bot.rate_limiter.allow(comment):
+                logger.debug("Rate limited comment %s", comment.id)
+                await self.bot.dispatch("rate_limited", comment)
+                return
             try:
                 namespace = self.parse_args(shlex.split(to_parse))
             except argparse.ArgumentError as e:
                 logger.warn(e)
                 await self.bot.dispatch("error", e)  # TODO: use correct rtwalk error
                 return
-            logger.debug(f"Command namespace: {namespace}")
+            logger.debug("Command namespace: %s", namespace)
             if command := self.commands.get(namespace.command):
+                if command.extension is not None:
+                    try:
+                        command = await self.bot.extensions.resolve(command)
+                    except Exception as e:
+                        logger.error(
+                            'Loading extension "{}" failed: {}'.format(
+                                command.extension, e
+                            )
+                        )
+                        await self.bot.dispatch("command_error", e)
+                        return
+                    if command is None:
+                        return
+                if command.is_saturated():
+                    if command.overflow == "drop":
+                        logger.debug(
+                            'Dropping "%s", command is saturated', command.name
+                        )
+                        return
+                    if command.overflow == "reject":
+                        await comment.reply(self.busy_message.format(command.name))
+                        return
+                abandoned: List[asyncio.Future] = []
+                token = _abandoned.set(abandoned)
+                if command.semaphore is not None:
+                    await command.semaphore.acquire()
                 try:
-                    return await self._run(command, namespace, comment)
+                    # Cancelling on timeout also cancels any HTTPClient call the
+                    # command is awaiting. Threads can't be interrupted, only abandoned.
+                    async with asyncio.timeout(command.timeout):
+                        return await self._run(command, namespace, comment)
+                except TimeoutError as e:
+                    logger.warn(
+                        'Command "{}" timed out after {}s'.format(
+                            command.name, command.timeout
+                        )
+                    )
+                    await self.bot.dispatch("command_error", e)
                 except Exception as e:
                     logger.exception(e)
                     await self.bot.dispatch("command_error", e)
+                finally:
+                    _abandoned.reset(token)
+                    if semaphore := command.semaphore:
+                        if abandoned:
+                            # The abandoned thread or process still runs, it keeps the slot
+                            # until it returns so max_concurrency caps what actually runs
+                            abandoned[0].add_done_callback(
+                                lambda _: semaphore.release()
+                            )
+                        else:
+                            semaphore.release()
+
+    async def _call_executor(self, fn: Callable, *args, **kwargs) -> Any:
+        future = asyncio.ensure_future(self.bot.run_in_executor(fn, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                if (abandoned := _abandoned.get(None)) is not None:
+                    abandoned.append(future)
+                # Nobody awaits it anymore, don't let its exception go unretrieved
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+    async def _drop_stale(self, comment: Comment, to_parse: str, age: float) -> bool:
+        overload = self.bot.overload
+        # Only the command name is needed, full parsing waits until the command is known to run
+        name = next(iter(to_parse.split(None, 1)), "")
+        if not overload.is_stale(age, self.commands.get(name)):  # type: ignore
+            return False
+        logger.debug('Dropping "%s", comment %s is %.1fs old', name, comment.id, age)
+        if overload.allow_busy_reply():  # type: ignore
+            await comment.reply(overload.busy_message.format(name))  # type: ignore
+        return True
 
     async def _run(
         self,
-        command: Union[CoroT, Callable],
+        command: Command,
         namespace: argparse.Namespace,
         comment: Comment,
     ) -> Any:
-        ctx = Ctx(self.bot, comment)
         args = namespace.__dict__
         command_name = args.pop("command")
+        if command.cache is None:
+            return await self._invoke(command, command_name, args, comment)
+
+        key = tuple(
+            sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in args.items())
+        )
+        if (hit := command.cache.get(key)) is None:
+            if inflight := command.cache._inflight.get(key):
+                # An identical invocation is already running, share its outcome
+                hit = await asyncio.shield(inflight)
+            else:
+                hit = await self._invoke_cached(
+                    command, command_name, args, comment, key
+                )
+                return hit[0]
+        result, replies = hit
+        for content, fields in replies:
+            await comment.reply(content, fields=fields)
+        return result
+
+    async def _invoke_cached(
+        self,
+        command: Command,
+        command_name: str,
+        args: Dict[str, Any],
+        comment: Comment,
+        key: Hashable,
+    ) -> Tuple[Any, List[Tuple[str, str]]]:
+        cache: ResultCache = command.cache  # type: ignore
+        future = cache._inflight[key] = asyncio.get_running_loop().create_future()
+        replies: List[Tuple[str, str]] = []
+        try:
+            result = await self._invoke(command, command_name, args, comment, replies)
+        except BaseException as e:
+            future.set_exception(
+                e if isinstance(e, Exception) else RuntimeError("Command was cancelled")
+            )
+            future.exception()  # Mark as retrieved in case nobody was waiting
+            raise
+        finally:
+            del cache._inflight[key]
+        cache.set(key, result, replies)
+        future.set_result((result, replies))
+        return result, replies
+
+    async def _invoke(
+        self,
+        command: Command,
+        command_name: str,
+        args: Dict[str, Any],
+        comment: Comment,
+        replies: Optional[List[Tuple[str, str]]] = None,
+    ) -> Any:
+        if command.executor == "process":
+            # Ctx holds the bot and its sessions, none of which survive pickling
+            binds = self.signatures[command_name].bind(None, **args)
+            result = await self._call_executor(
+                command.fn, *binds.args, executor="process", **binds.kwargs
+            )
+            if isinstance(result, str):
+                if replies is not None:
+                    replies.append((result, "full"))
+                await comment.reply(result)
+            return result
+        ctx = Ctx(self.bot, comment)
+        ctx._replies = replies
         binds = self.signatures[command_name].bind(ctx, **args)
-        if asyncio.iscoroutinefunction(command):
-            return await command(*binds.args, **binds.kwargs)
+        if asyncio.iscoroutinefunction(command.fn):
+            return await command.fn(*binds.args, **binds.kwargs)
         else:
-            return await asyncio.to_thread(command, *binds.args, **binds.kwargs)
+            return await self._call_executor(command.fn, *binds.args, **binds.kwargs)
+
+    def unregister(self, name: str):
+        """Removes a command along with its aliases and its entry in the help message."""
+        if (command := self.commands.get(name)) is None:
+            return
+        names = (command.name, *command.aliases)
+        for alias in names:
+            self.commands.pop(alias, None)
+            self.signatures.pop(alias, None)
+            self.subparsers.choices.pop(alias, None)  # type: ignore
+        self.subparsers._choices_actions = [
+            action
+            for action in self.subparsers._choices_actions
+            if action.dest != command.name
+        ]
+        self.invalidate_help()
 
     def remove_command(self, name):
         for action in self._actions:
@@ -285,8 +556,9 @@ class CommandManager(argparse.ArgumentParser):
                 and action.dest == "command"
             ):
                 del action.choices[name]
+        self.invalidate_help()
 
 
 async def help_command(ctx: Ctx):
     """Replies with the default help message"""
-    await ctx.reply(ctx.bot.command_manager.format_help())
+    await ctx.reply(ctx.bot.command_manager.help_text)
@@ -9,3 +9,7 @@ class TransportQueryError(RtLinkException):
     def __init__(self, e: GQLTE, *args, **kwargs):
         self.e: GQLTE = e
         super().__init__(*args, **kwargs)
+
+
+class CircuitOpenError(RtLinkException):
+    """Raised instead of calling the API while it is considered down."""
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import json
+import logging
+import sys
+import time
+import typing
+from types import ModuleType
+from typing import Annotated, Any, Dict, List, Optional, Union, TYPE_CHECKING
+
+from .commands import Command, Ctx, Flag
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+logger = logging.getLogger(__name__)
+
+_MARKER = "__rtlink_command__"
+
+# Annotations a command signature can be rebuilt from, by name
+_ANNOTATIONS: Dict[str, Any] = {
+    "": inspect.Parameter.empty,
+    "Ctx": Ctx,
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "Flag": Flag,
+}
+
+
+def command(
+    name: Optional[str] = None,
+    aliases: List[str] = [],
+    executor: str = "thread",
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    overflow: str = "queue",
+    cache: Optional[float] = None,
+    cache_size: int = 128,
+    max_age: Optional[float] = None,
+):
+    """Marks a function of an extension module as a command. Takes the same arguments as
+    [`Bot.command`][rtlink.bot.Bot.command], the command is registered when the extension is
+    loaded.
+
+    ```py
+    # music.py
+    from rtlink import Ctx, extensions
+
+    @extensions.command(aliases=["p"])
+    async def play(ctx: Ctx, *, url: str):
+        ...
+    ```
+    """
+
+    def __dec(fn):
+        setattr(
+            fn,
+            _MARKER,
+            dict(
+                name=name or fn.__name__,
+                aliases=list(aliases),
+                executor=executor,
+                max_concurrency=max_concurrency,
+                timeout=timeout,
+                overflow=overflow,
+                cache=cache,
+                cache_size=cache_size,
+                max_age=max_age,
+            ),
+        )
+        return fn
+
+    return __dec
+
+
+def _commands_of(module: ModuleType) -> List[Command]:
+    # Commands imported from another extension belong to that one
+    return [
+        Command(fn, **getattr(fn, _MARKER))
+        for fn in vars(module).values()
+        if callable(fn)
+        and hasattr(fn, _MARKER)
+        and getattr(fn, "__module__", None) == module.__name__
+    ]
+
+
+def _annotation_name(annotation: Any) -> str:
+    if isinstance(annotation, str):
+        return annotation
+    if annotation is inspect.Parameter.empty:
+        return ""
+    return getattr(annotation, "__name__", str(annotation))
+
+
+def _describe(command: Command) -> Dict[str, Any]:
+    params = []
+    for param in inspect.signature(command.fn).parameters.values():
+        annotation = param.annotation
+        entry: Dict[str, Any] = {"name": param.name, "kind": param.kind.name}
+        if typing.get_origin(annotation) is Annotated:
+            annotation, entry["doc"] = typing.get_args(annotation)[:2]
+        entry["annotation"] = _annotation_name(annotation)
+        if param.default is not inspect.Parameter.empty:
+            entry["default"] = param.default
+        params.append(entry)
+    return {
+        "options": getattr(command.fn, _MARKER),
+        "help": command.fn.__doc__,
+        "params": params,
+    }
+
+
+def manifest(*modules: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Imports extension modules and describes their commands: options, help text and
+    signature. Generate it at build time and pass it to
+    [`Extensions.add`][rtlink.extensions.Extensions.add], so the bot can register the commands
+    without importing the modules.
+
+    ```py
+    with open("commands.json", "w") as f:
+        json.dump(extensions.manifest("music", "admin"), f)
+    ```
+    """
+    return {
+        name: [_describe(c) for c in _commands_of(importlib.import_module(name))]
+        for name in modules
+    }
+
+
+def _signature(params: List[Dict[str, Any]]) -> inspect.Signature:
+    parameters = []
+    for entry in params:
+        annotation = _ANNOTATIONS.get(entry["annotation"], entry["annotation"])
+        if "doc" in entry:
+            annotation = Annotated[annotation, entry["doc"]]
+        parameters.append(
+            inspect.Parameter(
+                entry["name"],
+                inspect._ParameterKind[entry["kind"]],
+                default=entry.get("default", inspect.Parameter.empty),
+                annotation=annotation,
+            )
+        )
+    return inspect.Signature(parameters)
+
+
+def _stub(extension: str, entry: Dict[str, Any]) -> Command:
+    def stub(*args, **kwargs):
+        raise RuntimeError('Extension "{}" is not loaded'.format(extension))
+
+    # The command manager builds the parser from these, exactly as for the real function
+    stub.__signature__ = _signature(entry["params"])  # type: ignore
+    stub.__doc__ = entry.get("help")
+    stub.__name__ = entry["options"]["name"]
+    return Command(stub, **entry["options"])
+
+
+class _Extension:
+    __slots__ = ("name", "commands", "module", "loading")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.commands: List[str] = []
+        self.module: Optional[ModuleType] = None
+        self.loading: Optional[asyncio.Task] = None
+
+
+class Extensions:
+    """Command modules of a bot that are imported on demand.
+
+    With a manifest an extension's commands are registered from their recorded signatures, and
+    the module is only imported when one of them is first invoked, in a worker thread so the
+    event loop keeps running meanwhile. Bots with many commands or heavy dependencies start
+    without paying for either. Extensions can be unloaded and reloaded at any time, the RTE
+    connection is unaffected.
+
+    ```py
+    bot.extensions.add("music")  # imported right away
+    bot.extensions.add("admin", manifest="commands.json")  # imported on first use
+    ...
+    await bot.extensions.reload("admin")
+    ```
+
+    Commands are declared in the module with [`command`][rtlink.extensions.command].
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._extensions: Dict[str, _Extension] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._extensions
+
+    def loaded(self, name: str) -> bool:
+        return (
+            ext := self._extensions.get(name)
+        ) is not None and ext.module is not None
+
+    def add(
+        self,
+        name: str,
+        manifest: Optional[Union[str, Dict[str, List[Dict[str, Any]]]]] = None,
+    ):
+        """Adds an extension.
+
+        Args:
+            name: Import path of the module.
+            manifest: What [`manifest`][rtlink.extensions.manifest] returned, or the path of a
+                JSON file holding it. Without one, or when it doesn't list the module, the
+                module is imported now.
+        """
+        if name in self._extensions:
+            raise ValueError('Extension "{}" was already added'.format(name))
+        if isinstance(manifest, str):
+            with open(manifest) as f:
+                manifest = json.load(f)
+        ext = self._extensions[name] = _Extension(name)
+        self.bot._rte_options["comment"] = True
+        if manifest is not None and name in manifest:
+            self._register(ext, [_stub(name, entry) for entry in manifest[name]])
+        else:
+            try:
+                module = importlib.import_module(name)
+            except BaseException:
+                del self._extensions[name]
+                raise
+            self._activate(ext, module)
+
+    async def load(self, name: str):
+        """Imports an added extension unless it already is. Concurrent calls share the import."""
+        ext = self._extensions[name]
+        if ext.module is not None:
+            return
+        if (loading := ext.loading) is None:
+            loading = ext.loading = asyncio.ensure_future(
+                self._import(ext, reload=False)
+            )
+            # A failed import is retried by the next invocation
+            loading.add_done_callback(lambda _: setattr(ext, "loading", None))
+        await asyncio.shield(loading)
+
+    async def reload(self, name: str):
+        """Re-imports an extension and registers its commands anew. If the import fails, the
+        commands that were registered stay."""
+        ext = self._extensions[name]
+        if ext.module is None:
+            await self.load(name)
+        else:
+            await self._import(ext, reload=True)
+
+    def unload(self, name: str):
+        """Unregisters the commands of an extension and forgets its module, so adding it again
+        imports the current code."""
+        ext = self._extensions.pop(name)
+        for command in ext.commands:
+            self.bot.command_manager.unregister(command)
+        sys.modules.pop(name, None)
+        logger.info('Unloaded extension "%s"', name)
+
+    async def _import(self, ext: _Extension, reload: bool):
+        start = time.perf_counter()
+        if reload:
+            module = await self.bot.run_in_executor(importlib.reload, ext.module)
+        else:
+            module = await self.bot.run_in_executor(importlib.import_module, ext.name)
+        if self._extensions.get(ext.name) is not ext:
+            # Unloaded while importing
+            return
+        logger.debug('Imported "%s" in %.3fs', ext.name, time.perf_counter() - start)
+        self._activate(ext, module)
+
+    def _activate(self, ext: _Extension, module: ModuleType):
+        commands = _commands_of(module)
+        missing = set(ext.commands) - {c.name for c in commands}
+        if ext.module is None and missing:
+            logger.warn(
+                'Extension "{}" no longer has the commands {} listed in its manifest'.format(
+                    ext.name, ", ".join(sorted(missing))
+                )
+            )
+        ext.module = module
+        self._register(ext, commands)
+        logger.info('Loaded extension "%s"', ext.name)
+
+    def _register(self, ext: _Extension, commands: List[Command]):
+        manager = self.bot.command_manager
+        for name in ext.commands:
+            manager.unregister(name)
+        ext.commands = []
+        for command in commands:
+            command.extension = ext.name
+            manager.add_command(command)
+            if manager.commands.get(command.name) is command:
+                ext.commands.append(command.name)
+
+    async def resolve(self, command: Command) -> Optional[Command]:
+        """The loaded version of a command, importing its extension if needed. `None` if the
+        extension turned out not to have it."""
+        if command.extension is None or self.loaded(command.extension):
+            return command
+        await self.load(command.extension)
+        return self.bot.command_manager.commands.get(command.name)
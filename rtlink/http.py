@@ -1,52 +1,222 @@
 from __future__ import annotations
 
 import logging
-from typing import Union, List, Optional, Any
+import os
+import time
+from collections import OrderedDict
+from typing import Union, List, Optional, Any, Dict, Tuple
 from datetime import datetime
 import asyncio
 
 import aiohttp
 from aiocache import Cache, BaseCache
-from gql import Client, gql
+from gql import Client
+from gql.client import AsyncClientSession
 from gql.transport.exceptions import TransportQueryError
 from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import DocumentNode
 
-from .types import Comment, User, File, Forum
+from .types import Comment, User, File, Forum, Post, NEW_COMMENT_LOADERS
+from .pagination import Paginator
+from .runner import SharedResources
 from .errors import TransportQueryError as _TransportQueryError
+from .ratelimit import RateLimit, TokenBucket
+from .batching import ReplyQueue
+from .apq import PersistedQueryTransport
+from .resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    RetryPolicy,
+    call_with_policy,
+    operation_of,
+)
+from .queries import (
+    CACHEABLE_OPERATIONS,
+    COMMENT_PROFILES,
+    CREATE_COMMENT_MUTATIONS,
+    GET_COMMENT_QUERY,
+    GET_COMMENTS_QUERY,
+    GET_FORUM_QUERY,
+    GET_FORUMS_QUERY,
+    GET_POSTS_QUERY,
+    LOGIN_MUTATION,
+    LOGOUT_MUTATION,
+    ME_QUERY,
+    VERSION_QUERY,
+)
+
+
+class _CommentCache:
+    """Size bounded LRU of the comments one client fetched, expiring after `ttl` seconds so
+    edits and votes show up again."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, Tuple[float, Comment]] = OrderedDict()
+
+    def get(self, id: str) -> Optional[Comment]:
+        if entry := self._entries.get(id):
+            expires, comment = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(id)
+                return comment
+            del self._entries[id]
+        return None
+
+    def set(self, id: str, comment: Comment):
+        self._entries[id] = (time.monotonic() + self.ttl, comment)
+        self._entries.move_to_end(id)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
 
 
 class HTTPClient:
-    def __init__(self, api_url: str):
+    """Maintains the connection to the rtwalk GraphQL API.
+
+    Args:
+        api_url: Url of the rtwalk GraphQL endpoint.
+        mutation_rate_limit: Budget for mutations. Calls over budget wait for a token instead of
+            being rejected by the server.
+        batch_window: When set, comments created within this many seconds of each other are sent
+            as a single GraphQL document. See [`ReplyQueue`][rtlink.batching.ReplyQueue].
+        max_batch: Maximum number of comments per batched request.
+        coalesce_replies: Merge batched replies to the same comment into one message.
+        persisted_queries: Send query hashes instead of query text, see
+            [`PersistedQueryTransport`][rtlink.apq.PersistedQueryTransport].
+        cacheable_get: With `persisted_queries`, send read only lookups like `getForum` and
+            `version` as GET requests so HTTP caches can serve them.
+        retry_policy: How failed calls are retried, see
+            [`RetryPolicy`][rtlink.resilience.RetryPolicy].
+        retry_policies: Policies for specific operations, keyed by root field name
+            (e.g. `"getForum"`). Operations not listed use `retry_policy`.
+        circuit_breaker: Stops calling the API while it keeps failing, see
+            [`CircuitBreaker`][rtlink.resilience.CircuitBreaker]. `True` uses the default settings,
+            `False` disables it.
+        comment_cache_ttl: Seconds a fetched comment is served from the cache.
+        comment_cache_size: Comments kept in the cache. Comments are cached per client and
+            never in the entity cache shared by a [`BotRunner`][rtlink.runner.BotRunner], so
+            replying to a cached comment always posts as this client's user.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        mutation_rate_limit: Optional[RateLimit] = None,
+        batch_window: Optional[float] = None,
+        max_batch: int = 20,
+        coalesce_replies: bool = False,
+        persisted_queries: bool = False,
+        cacheable_get: bool = False,
+        retry_policy: RetryPolicy = RetryPolicy(),
+        retry_policies: Optional[Dict[str, RetryPolicy]] = None,
+        circuit_breaker: Union[CircuitBreaker, bool] = True,
+        comment_cache_ttl: float = 60,
+        comment_cache_size: int = 1024,
+    ):
         self.api_url = api_url
         self.cookie_jar = aiohttp.CookieJar()
-        self.client = Client(
-            transport=AIOHTTPTransport(
-                api_url, client_session_args={"cookie_jar": self.cookie_jar}
-            ),
-            fetch_schema_from_transport=True,
-        )
+        session_args = {"cookie_jar": self.cookie_jar}
+        if persisted_queries:
+            transport: AIOHTTPTransport = PersistedQueryTransport(
+                api_url,
+                get_operations=CACHEABLE_OPERATIONS if cacheable_get else (),
+                client_session_args=session_args,
+            )
+        else:
+            transport = AIOHTTPTransport(api_url, client_session_args=session_args)
+        self.client = Client(transport=transport, fetch_schema_from_transport=True)
         self.user: Optional[User] = None
         self._cache: BaseCache = Cache()
+        self._comments = _CommentCache(comment_cache_ttl, comment_cache_size)
+        self._session: Optional[AsyncClientSession] = None
+        self._shared: Optional[SharedResources] = None
+        self._connect_lock = asyncio.Lock()
+        self._mutation_bucket: Optional[TokenBucket] = (
+            mutation_rate_limit.bucket() if mutation_rate_limit else None
+        )
+        self.retry_policy = retry_policy
+        self.retry_policies = retry_policies or {}
+        self.circuit_breaker: Optional[CircuitBreaker] = (
+            CircuitBreaker() if circuit_breaker is True else circuit_breaker or None
+        )
+        self._latencies = LatencyTracker()
+        self._session_saved = False
+        self._reply_queue: Optional[ReplyQueue] = (
+            ReplyQueue(self, batch_window, max_batch, coalesce_replies)
+            if batch_window
+            else None
+        )
+
+    def use_shared(self, shared: SharedResources):
+        """Makes this client use a shared connection pool, schema and entity cache.
+        Must be called before the first request."""
+        if self._session is not None:
+            raise RuntimeError("Can't share resources of an already connected client")
+        self._shared = shared
+        self._cache = shared.cache
+
+    async def _get_session(self) -> AsyncClientSession:
+        # One long lived session shared by every call. `async with self.client` per call would
+        # reopen the aiohttp session each time and fails when two calls overlap.
+        if self._session is None:
+            async with self._connect_lock:
+                if self._session is None:
+                    if self._shared is None:
+                        self._session = await self.client.connect_async()
+                    else:
+                        self._session = await self._connect_shared(self._shared)
+        return self._session
+
+    async def _connect_shared(self, shared: SharedResources) -> AsyncClientSession:
+        transport: AIOHTTPTransport = self.client.transport  # type: ignore
+        transport.client_session_args.update(  # type: ignore
+            connector=shared.get_connector(), connector_owner=False
+        )
+        # Closing the session leaves pooled connections open, don't wait for them to close
+        transport.ssl_close_timeout = 0
+        # Only the first client to connect introspects the schema, the rest reuse it
+        async with shared.schema_lock:
+            if shared.schema is not None:
+                self.client.schema = shared.schema
+            session = await self.client.connect_async()
+            shared.schema = self.client.schema
+        return session
+
+    async def _execute(
+        self, document: DocumentNode, variable_values: Optional[dict] = None
+    ) -> dict:
+        """Executes a document under its retry policy and the circuit breaker."""
+        operation, is_query = operation_of(document)
+        policy = self.retry_policies.get(operation, self.retry_policy)
+        idempotent = is_query if policy.idempotent is None else policy.idempotent
+
+        async def attempt() -> dict:
+            session = await self._get_session()
+            return await session.execute(document, variable_values=variable_values)
+
+        return await call_with_policy(
+            operation,
+            attempt,
+            policy,
+            idempotent,
+            self.circuit_breaker,
+            self._latencies,
+        )
+
+    async def _throttle_mutation(self, n: int = 1):
+        if self._mutation_bucket is not None:
+            await self._mutation_bucket.acquire(min(n, self._mutation_bucket.capacity))
+
+    async def close(self):
+        """Closes the underlying HTTP session. Pending calls are cancelled by aiohttp."""
+        if self._session is not None:
+            self._session = None
+            await self.client.close_async()
 
     async def get_api_info(self) -> dict:
         try:
-            async with self.client as session:
-                res = await session.execute(
-                    gql(
-                        """
-                    query {
-                       version {
-                            major
-                            minor
-                            bugFix
-                            rte
-                            vc
-                            versionString
-                       } 
-                    }
-                    """
-                    )
-                )
+            res = await self._execute(VERSION_QUERY)
 
         except TransportQueryError as e:
             raise _TransportQueryError(e)
@@ -54,53 +224,73 @@ class HTTPClient:
 
     async def login(self, email: str, password: str):
         try:
-            async with self.client as session:
-                res = await session.execute(
-                    gql(
-                        """
-                    mutation($email: String!, $password: String!) {
-                        login(email: $email, password: $password) {
-                            id
-                            username
-                            displayName
-                            bio
-                            pfp {
-                                loc
-                            }
-                            banner  {
-                                loc
-                            }
-                            createdAt
-                            modifiedAt
-                            admin
-                            bot
-                        }
-                    }
-                    """
-                    ),
-                    variable_values={
-                        "email": email,
-                        "password": password,
-                    },
-                )
+            await self._throttle_mutation()
+            res = await self._execute(
+                LOGIN_MUTATION,
+                {
+                    "email": email,
+                    "password": password,
+                },
+            )
         except TransportQueryError as e:
             logging.error(e)
             raise _TransportQueryError(e)
+        self._set_user(res["login"])
+
+    def _set_user(self, res: dict):
         self.user: User = User(
-            id=res["login"]["id"],
-            username=res["login"]["username"],
-            display_name=res["login"]["displayName"],
-            created_at=datetime.fromtimestamp(res["login"]["createdAt"]),
-            modified_at=datetime.fromtimestamp(res["login"]["modifiedAt"]),
-            bio=res["login"]["bio"],
-            pfp=File(res["login"]["pfp"]["loc"]) if res["login"]["pfp"] else None,
-            banner=File(res["login"]["banner"]["loc"])
-            if res["login"]["banner"]
-            else None,
-            admin=res["login"]["admin"],
-            bot=res["login"]["bot"],
+            id=res["id"],
+            username=res["username"],
+            display_name=res["displayName"],
+            created_at=datetime.fromtimestamp(res["createdAt"]),
+            modified_at=datetime.fromtimestamp(res["modifiedAt"]),
+            bio=res["bio"],
+            pfp=File(res["pfp"]["loc"]) if res["pfp"] else None,
+            banner=File(res["banner"]["loc"]) if res["banner"] else None,
+            admin=res["admin"],
+            bot=res["bot"],
         )
 
+    def save_session(self, path: str):
+        """Saves the session cookies to `path` so that a later process can pick the session up
+        with [`resume_session`][rtlink.http.HTTPClient.resume_session] instead of logging in
+        again. The session stays valid on the server, don't call `logout` if you want to resume it.
+
+        The file holds the session credentials and is written readable by the owner only.
+        """
+        # Create it with restricted permissions before aiohttp writes the cookies to it
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+        self.cookie_jar.save(path)
+        self._session_saved = True
+
+    async def resume_session(self, path: str) -> bool:
+        """Loads cookies saved with [`save_session`][rtlink.http.HTTPClient.save_session] and
+        checks them with a single query for the current user.
+
+        The file is unpickled, only load files this process wrote itself.
+
+        Returns:
+            (bool): Whether the session is still valid. When it isn't the cookies are cleared and
+                the caller has to log in.
+        """
+        try:
+            self.cookie_jar.load(path)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logging.warn("Couldn't load saved session from {}: {}".format(path, e))
+            return False
+        try:
+            res = await self._execute(ME_QUERY)
+        except Exception as e:
+            logging.debug("Saved session was rejected: %s", e)
+            res = {}
+        if not res.get("me"):
+            self.cookie_jar.clear()
+            return False
+        self._set_user(res["me"])
+        return True
+
     async def fetch_forum(
         self,
         name: Optional[str] = None,
@@ -109,137 +299,148 @@ class HTTPClient:
         names: Optional[List[str]] = None,
     ) -> Union[Optional[Forum], List[Forum]]:
         try:
-            async with self.client as session:
-                if id or name:
-                    res = await session.execute(
-                        gql(
-                            """
-                        query($id: String, $name: String) {
-                            getForum(id: $id, name: $name) {
-                                id
-                                name
-                                displayName
-                                description
-                                icon {
-                                    loc
-                                }
-                                banner {
-                                    loc
-                                }
-                                postCount
-                                createdAt
-                                modifiedAt
-                                ownerId
-                                moderators
-                                bannedMembers
-                                locked
-                            }
-                        }
-                        """
-                        ),
-                        variable_values={
-                            "id": id,
-                            "name": name,
-                        },
-                    )
+            if id or name:
+                res = await self._execute(
+                    GET_FORUM_QUERY,
+                    {
+                        "id": id,
+                        "name": name,
+                    },
+                )
         except TransportQueryError as e:
             logging.error(e)
             raise _TransportQueryError(e)
         if id or name:
             if not res["getForum"]:
                 return None
-            f = Forum(
-                id=res["getForum"]["id"],
-                name=res["getForum"]["name"],
-                display_name=res["getForum"]["displayName"],
-                description=res["getForum"]["description"],
-                icon=File(res["getForum"]["icon"]["loc"])
-                if res["getForum"]["icon"]
-                else None,
-                banner=File(res["getForum"]["banner"]["loc"])
-                if res["getForum"]["banner"]
-                else None,
-                post_count=res["getForum"]["postCount"],
-                created_at=datetime.fromtimestamp(res["getForum"]["createdAt"]),
-                modified_at=datetime.fromtimestamp(res["getForum"]["modifiedAt"]),
-                owner_id=res["getForum"]["ownerId"],
-                moderators=res["getForum"]["moderators"],
-                banned_members=res["getForum"]["bannedMembers"],
-                locked=res["getForum"]["locked"],
-            )
+            f = Forum._populate(res["getForum"])
             await self.cache(id or name, f)
             return f
 
+    async def fetch_comment(self, id: str) -> Optional[Comment]:
+        """Fetches a comment by ID and keeps it in the comment cache of this client."""
+        try:
+            res = await self._execute(GET_COMMENT_QUERY, {"id": id})
+        except TransportQueryError as e:
+            logging.error(e)
+            raise _TransportQueryError(e)
+        if not res["getComment"]:
+            return None
+        comment = Comment._populate(res["getComment"])
+        comment._client = self
+        self._comments.set(id, comment)
+        return comment
+
     async def create_comment(
-        self, post_id: str, content: str, reply_to: Optional[str] = None
+        self,
+        post_id: str,
+        content: str,
+        reply_to: Optional[str] = None,
+        fields: str = "full",
     ) -> Comment:
+        """Creates a comment as the logged in user.
+
+        Args:
+            post_id: Post to comment on.
+            content: Content of the comment.
+            reply_to: ID of the comment this one replies to.
+            fields: Which field profile (`"minimal"`, `"standard"` or `"full"`) to request back.
+                Smaller profiles mean smaller responses, the fields they leave out are derived
+                locally when first accessed.
+        """
+        if fields not in COMMENT_PROFILES:
+            raise ValueError('Unknown field profile "{}"'.format(fields))
+        if self._reply_queue is not None:
+            return await self._reply_queue.submit(post_id, content, reply_to, fields)
         try:
-            async with self.client as session:
-                res = await session.execute(
-                    gql(
-                        """
-                    mutation($postId: String!, $content: String!, $replyTo: String) {
-                        createComment(postId: $postId, content: $content, replyTo: $replyTo) {
-                            id
-                            content
-                            commenterId
-                            forumId
-                            replyTo
-                            postId
-                            commenter {
-                                id
-                                username
-                                displayName
-                                bio
-                                pfp {
-                                    loc
-                                }
-                                banner  {
-                                    loc
-                                }
-                                createdAt
-                                modifiedAt
-                                admin
-                                bot
-                            }
-                            createdAt
-                            modifiedAt
-                            replyCount
-                            upvotes
-                            downvotes
-                            upvotedBy
-                            downvotedBy
-                        }
-                    }
-                    """
-                    ),
-                    variable_values={
-                        "postId": post_id,
-                        "content": content,
-                        "replyTo": reply_to,
-                    },
-                )
+            await self._throttle_mutation()
+            res = await self._execute(
+                CREATE_COMMENT_MUTATIONS[fields],
+                {
+                    "postId": post_id,
+                    "content": content,
+                    "replyTo": reply_to,
+                },
+            )
         except TransportQueryError as e:
             logging.error(e)
             raise _TransportQueryError(e)
 
-        comment = Comment._populate(res["createComment"])
+        return self._new_comment(res["createComment"])
+
+    def _new_comment(self, res: dict) -> Comment:
+        comment = Comment._populate(res, lazy=NEW_COMMENT_LOADERS)
         comment._client = self
         return comment
 
+    def iter_comments(
+        self, post_id: str, page_size: int = 50, prefetch: int = 1
+    ) -> Paginator[Comment]:
+        """Iterates over the comments of a post, fetching pages in the background.
+
+        ```py
+        async for comment in client.iter_comments(post_id):
+            ...
+        ```
+
+        Args:
+            post_id: The post whose comments to iterate.
+            page_size: Comments per request.
+            prefetch: Number of pages requested ahead of the one being consumed.
+        """
+
+        async def fetch_page(page: int, per_page: int) -> List[Comment]:
+            res = await self._execute_page(
+                GET_COMMENTS_QUERY,
+                {"postId": post_id, "page": page, "perPage": per_page},
+            )
+            comments = []
+            for item in res["getComments"]:
+                comment = Comment._populate(item)
+                comment._client = self
+                comments.append(comment)
+            return comments
+
+        return Paginator(fetch_page, page_size, prefetch)
+
+    def iter_posts(
+        self, forum_id: str, page_size: int = 50, prefetch: int = 1
+    ) -> Paginator[Post]:
+        """Iterates over the posts of a forum. See
+        [`iter_comments`][rtlink.http.HTTPClient.iter_comments]."""
+
+        async def fetch_page(page: int, per_page: int) -> List[Post]:
+            res = await self._execute_page(
+                GET_POSTS_QUERY,
+                {"forumId": forum_id, "page": page, "perPage": per_page},
+            )
+            return [Post._populate(item) for item in res["getPosts"]]
+
+        return Paginator(fetch_page, page_size, prefetch)
+
+    def iter_forums(self, page_size: int = 50, prefetch: int = 1) -> Paginator[Forum]:
+        """Iterates over all forums. See
+        [`iter_comments`][rtlink.http.HTTPClient.iter_comments]."""
+
+        async def fetch_page(page: int, per_page: int) -> List[Forum]:
+            res = await self._execute_page(
+                GET_FORUMS_QUERY, {"page": page, "perPage": per_page}
+            )
+            return [Forum._populate(item) for item in res["getForums"]]
+
+        return Paginator(fetch_page, page_size, prefetch)
+
+    async def _execute_page(self, document, variables: dict) -> dict:
+        try:
+            return await self._execute(document, variables)
+        except TransportQueryError as e:
+            logging.error(e)
+            raise _TransportQueryError(e)
+
     async def logout(self):
         try:
-            res = await self.client.execute_async(
-                gql(
-                    """
-                mutation {
-                    logout {
-                        msg
-                    }
-                }
-                """
-                )
-            )
+            await self._throttle_mutation()
+            res = await self._execute(LOGOUT_MUTATION)
         except TransportQueryError as e:
             logging.error(e)
             raise _TransportQueryError(e)
@@ -266,6 +467,11 @@ class HTTPClient:
         else:
             return await self._cache.get(id)
 
+    async def get_cached_comment(self, id: str) -> Optional[Comment]:
+        if comment := self._comments.get(id):
+            comment._client = self
+        return comment
+
     def __del__(self):
-        if self.user:
+        if self.user and not self._session_saved:
             logging.warn("User not logged out: Session will be hanging")
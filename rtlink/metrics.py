@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+
+class Metrics:
+    """Counters and gauges kept in process. Updating one is a dict operation, so they can stay
+    on in production. Read them with [`snapshot`][rtlink.metrics.Metrics.snapshot], for example
+    from a periodic task that forwards them to your monitoring system.
+
+    Names are dotted paths like `lookup.forum.hit`.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, float] = {}
+
+    def incr(self, name: str, n: float = 1):
+        self._values[name] = self._values.get(name, 0) + n
+
+    def set(self, name: str, value: float):
+        self._values[name] = value
+
+    def get(self, name: str, default: float = 0) -> float:
+        return self._values.get(name, default)
+
+    def hit_rate(self, prefix: str) -> Optional[float]:
+        """Share of `<prefix>.hit` among the `hit`, `joined` and `miss` counters of `prefix`.
+        `None` until there was a lookup."""
+        hits = self.get(prefix + ".hit")
+        total = hits + self.get(prefix + ".joined") + self.get(prefix + ".miss")
+        return hits / total if total else None
+
+    def snapshot(self, prefix: str = "") -> Dict[str, float]:
+        """A copy of every value whose name starts with `prefix`."""
+        return {k: v for k, v in self._values.items() if k.startswith(prefix)}
+
+    def reset(self, prefix: str = ""):
+        for name in [k for k in self._values if k.startswith(prefix)]:
+            del self._values[name]
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import fractions
+import logging
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+import av
+import numpy as np
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+# 20ms, the Opus frame size
+FRAME_SAMPLES = 960
+_FRAME_VALUES = FRAME_SAMPLES * CHANNELS
+_TIME_BASE = fractions.Fraction(1, SAMPLE_RATE)
+
+
+class MixerSource:
+    """A track playing through a [`Mixer`][rtlink.mixer.Mixer]. Returned by
+    [`Mixer.add`][rtlink.mixer.Mixer.add].
+
+    Attributes:
+        track: The source track.
+        gain: Volume multiplier, `1.0` plays the source unchanged. Takes effect on the next
+            frame.
+    """
+
+    def __init__(self, mixer: Mixer, track: MediaStreamTrack, gain: float, buffer: int):
+        self.mixer = mixer
+        self.track = track
+        self.gain = gain
+        self._chunks: Deque[np.ndarray] = deque()
+        self._buffered = 0
+        self._limit = buffer * _FRAME_VALUES
+        self._space = asyncio.Event()
+        self._space.set()
+        self._exhausted = False
+        self._ended = asyncio.Event()
+        self._task = asyncio.create_task(self._pull())
+
+    @property
+    def ended(self) -> bool:
+        return self._ended.is_set()
+
+    async def wait(self):
+        """Waits until the source has played to its end or was removed."""
+        await self._ended.wait()
+
+    def remove(self):
+        """Stops playing the source. The track itself isn't stopped."""
+        self.mixer.remove(self)
+
+    async def _pull(self):
+        resampler = av.AudioResampler(format="s16", layout="stereo", rate=SAMPLE_RATE)
+        try:
+            while True:
+                # Don't read ahead more than the buffer, sources that aren't paced in real time
+                # would otherwise be decoded into memory all at once
+                await self._space.wait()
+                frame = await self.track.recv()
+                for out in resampler.resample(frame):
+                    samples = out.to_ndarray().reshape(-1)[: out.samples * CHANNELS]
+                    self._chunks.append(samples)
+                    self._buffered += len(samples)
+                if self._buffered >= self._limit:
+                    self._space.clear()
+        except MediaStreamError:
+            pass
+        except Exception as e:
+            logger.error("Mixer source %s failed: %s", self.track.id, e)
+        finally:
+            self._exhausted = True
+
+    def _read(self, out: np.ndarray) -> bool:
+        """Copies the next frame into `out`, padding with silence. Returns `False` once the
+        source is over."""
+        filled = 0
+        while filled < _FRAME_VALUES and self._chunks:
+            chunk = self._chunks[0]
+            n = min(len(chunk), _FRAME_VALUES - filled)
+            out[filled : filled + n] = chunk[:n]
+            filled += n
+            if n == len(chunk):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = chunk[n:]
+        out[filled:] = 0
+        self._buffered -= filled
+        if self._buffered < self._limit:
+            self._space.set()
+        return bool(filled) or not self._exhausted
+
+    def _close(self):
+        self._task.cancel()
+        self._chunks.clear()
+        self._ended.set()
+
+
+class Mixer(MediaStreamTrack):
+    """Audio track that plays any number of sources at once, e.g. background music under
+    announcements. Published with one [`VcClient.play`][rtlink.vc.VcClient.play], so a room
+    costs one producer and one Opus encoder however many sources play. Sources come and go
+    without touching the transport.
+
+    Every 20ms one frame is taken from each source, resampled to 48kHz stereo, and the frames
+    are summed with their gains in a single matrix product. Sources that have nothing buffered
+    contribute silence, the mix never waits for them.
+
+    ```py
+    mixer = await vc.mixer()
+    music = mixer.add(MediaPlayer("music.ogg").audio, gain=0.3)
+    await mixer.add(MediaPlayer("announcement.ogg").audio).wait()
+    music.gain = 1.0
+    ```
+
+    Args:
+        buffer: Frames read ahead per source.
+    """
+
+    kind = "audio"
+
+    def __init__(self, buffer: int = 10):
+        super().__init__()
+        self.buffer = buffer
+        self._sources: List[MixerSource] = []
+        self._start: Optional[float] = None
+        self._pts = 0
+
+    @property
+    def sources(self) -> List[MixerSource]:
+        return list(self._sources)
+
+    def add(self, track: MediaStreamTrack, gain: float = 1.0) -> MixerSource:
+        """Starts playing a track in the mix."""
+        if track.kind != "audio":
+            raise ValueError("Only audio tracks can be mixed")
+        source = MixerSource(self, track, gain, self.buffer)
+        self._sources.append(source)
+        return source
+
+    def remove(self, source: MixerSource):
+        if source in self._sources:
+            self._sources.remove(source)
+        source._close()
+
+    def stop(self):
+        for source in list(self._sources):
+            self.remove(source)
+        super().stop()
+
+    async def recv(self) -> av.AudioFrame:
+        if self.readyState != "live":
+            raise MediaStreamError
+        # Paced in real time, like the tracks aiortc generates itself
+        if self._start is None:
+            self._start = time.time()
+        else:
+            self._pts += FRAME_SAMPLES
+            await asyncio.sleep(self._start + self._pts / SAMPLE_RATE - time.time())
+
+        mixed = self._mix()
+        frame = av.AudioFrame.from_ndarray(
+            mixed.reshape(1, -1), format="s16", layout="stereo"
+        )
+        frame.sample_rate = SAMPLE_RATE
+        frame.pts = self._pts
+        frame.time_base = _TIME_BASE
+        return frame
+
+    def _mix(self) -> np.ndarray:
+        sources = list(self._sources)
+        frames = np.empty((len(sources), _FRAME_VALUES), np.int16)
+        gains = np.zeros(len(sources), np.float32)
+        for i, source in enumerate(sources):
+            if source._read(frames[i]):
+                gains[i] = source.gain
+            else:
+                self.remove(source)
+        mixed = gains @ frames.astype(np.float32)
+        return np.clip(mixed, -32768, 32767).astype(np.int16)
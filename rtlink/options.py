@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import socket
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory
+from websockets.legacy.client import WebSocketClientProtocol
+
+
+@dataclass
+class WebsocketOptions:
+    """Transport settings for the RTE and VC websockets. The defaults are the `websockets`
+    library defaults, which is what rtlink used before these were configurable.
+
+    Measured effects are in the [tuning guide](tuning.md), reproduce them with
+    `benchmarks/ws_transport.py`.
+
+    Attributes:
+        compression: Negotiate permessage-deflate. Trades CPU on both ends for bandwidth.
+        max_window_bits: Deflate window size (9-15) for both directions. Smaller windows use less
+            memory per connection and compress slightly worse. `None` keeps the library default.
+        max_queue: Messages buffered before reading from the socket pauses. Larger values
+            absorb longer bursts while handlers are busy at the cost of memory
+            (up to `max_queue * max_size`). `None` is unbounded.
+        max_size: Largest accepted message in bytes, larger ones close the connection.
+            `None` disables the limit.
+        read_limit: High water mark of the read buffer in bytes.
+        write_limit: High water mark of the write buffer in bytes.
+        ping_interval: Seconds between keepalive pings. `None` disables them.
+        ping_timeout: Seconds to wait for a pong before the connection is considered dead.
+        tcp_nodelay: Disable Nagle's algorithm so small frames (pings, VC signalling) go out
+            immediately.
+    """
+
+    compression: bool = True
+    max_window_bits: Optional[int] = None
+    max_queue: Optional[int] = 32
+    max_size: Optional[int] = 2**20
+    read_limit: int = 2**16
+    write_limit: int = 2**16
+    ping_interval: Optional[float] = 20
+    ping_timeout: Optional[float] = 20
+    tcp_nodelay: bool = True
+
+    def connect_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for `websockets.client.connect`."""
+        kwargs: Dict[str, Any] = {
+            "max_queue": self.max_queue,
+            "max_size": self.max_size,
+            "read_limit": self.read_limit,
+            "write_limit": self.write_limit,
+            "ping_interval": self.ping_interval,
+            "ping_timeout": self.ping_timeout,
+        }
+        if not self.compression:
+            kwargs["compression"] = None
+        elif self.max_window_bits is not None:
+            kwargs["extensions"] = [
+                ClientPerMessageDeflateFactory(
+                    server_max_window_bits=self.max_window_bits,
+                    client_max_window_bits=self.max_window_bits,
+                    compress_settings={"memLevel": 5},
+                )
+            ]
+        return kwargs
+
+    def apply(self, ws: WebSocketClientProtocol):
+        """Applies the socket level options to an open connection."""
+        sock = ws.transport.get_extra_info("socket")
+        if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(
+                socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.tcp_nodelay)
+            )
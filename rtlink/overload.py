@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+
+from .ratelimit import RateLimit
+
+if TYPE_CHECKING:
+    from .commands import Command
+    from .types import Comment
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadController:
+    """Keeps the bot responsive to fresh comments when it falls behind the RTE stream.
+
+    The backlog age of a comment is how long ago it was created. Past `shed_events_after` seconds
+    `comment` listeners are skipped and only commands are processed. Commands older than their
+    max age are dropped, optionally with a short busy reply, instead of answering minutes late.
+    Ages are measured with the local clock, keep it in sync with the server's.
+
+    Args:
+        shed_events_after: Backlog age in seconds past which `comment` listeners are skipped.
+            `None` never skips them.
+        command_max_age: Age in seconds past which commands are dropped, unless the command sets
+            its own `max_age`. `None` never drops them.
+        busy_message: Replied to dropped commands when set. `{}` is replaced with the command name.
+        busy_replies: Limits how many busy replies are sent, so that they don't add to the backlog.
+
+    Attributes:
+        lag: Backlog age of the latest comment in seconds.
+        overloaded: Whether the latest comment was past `shed_events_after`.
+        skipped_events: Number of comments whose listeners were skipped.
+        dropped_commands: Number of commands dropped for being too old.
+    """
+
+    def __init__(
+        self,
+        shed_events_after: Optional[float] = 5,
+        command_max_age: Optional[float] = 30,
+        busy_message: Optional[str] = None,
+        busy_replies: RateLimit = RateLimit(5, 10),
+    ):
+        self.shed_events_after = shed_events_after
+        self.command_max_age = command_max_age
+        self.busy_message = busy_message
+        self._busy_bucket = busy_replies.bucket()
+        self.lag: float = 0
+        self.overloaded = False
+        self.skipped_events = 0
+        self.dropped_commands = 0
+
+    def observe(self, comment: Comment) -> float:
+        """Records the backlog age of a comment that is about to be handled and returns it."""
+        created = comment.created_at
+        if isinstance(created, datetime):
+            created = created.timestamp()
+        self.lag = max(time.time() - created, 0) if created else 0
+        overloaded = (
+            self.shed_events_after is not None and self.lag > self.shed_events_after
+        )
+        if overloaded != self.overloaded:
+            self.overloaded = overloaded
+            if overloaded:
+                logger.warn(
+                    "Falling behind the RTE stream by {:.1f}s, shedding load".format(
+                        self.lag
+                    )
+                )
+            else:
+                logger.info("Caught up with the RTE stream")
+        return self.lag
+
+    def skip_events(self, age: float) -> bool:
+        if self.shed_events_after is not None and age > self.shed_events_after:
+            self.skipped_events += 1
+            return True
+        return False
+
+    def is_stale(self, age: float, command: Optional[Command]) -> bool:
+        max_age = self.command_max_age
+        if command is not None and command.max_age is not None:
+            max_age = command.max_age
+        if max_age is not None and age > max_age:
+            self.dropped_commands += 1
+            return True
+        return False
+
+    def allow_busy_reply(self) -> bool:
+        return self.busy_message is not None and self._busy_bucket.try_acquire()
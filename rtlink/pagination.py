@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+
+class Paginator(Generic[T]):
+    """Async iterator over a paged API listing.
+
+    While the items of one page are being consumed the next `prefetch` pages are already being
+    requested. Only those pages are held in memory, never the whole listing. Iteration ends at the
+    first page that comes back with fewer than `page_size` items.
+
+    Args:
+        fetch_page: Coroutine function taking `(page, page_size)` and returning the page's items.
+            Pages are numbered from 0.
+        page_size: Items per request.
+        prefetch: Pages to request ahead of the one being consumed. 0 disables prefetching.
+    """
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int, int], Awaitable[List[T]]],
+        page_size: int = 50,
+        prefetch: int = 1,
+    ):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self._fetch_page = fetch_page
+        self.page_size = page_size
+        self.prefetch = max(prefetch, 0)
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[T]:
+        pending: Deque[asyncio.Task[List[T]]] = deque()
+        next_page = 0
+
+        def schedule():
+            nonlocal next_page
+            while len(pending) <= self.prefetch:
+                pending.append(
+                    asyncio.create_task(self._fetch_page(next_page, self.page_size))
+                )
+                next_page += 1
+
+        try:
+            schedule()
+            while pending:
+                items = await pending.popleft()
+                if len(items) < self.page_size:
+                    # Last page, whatever was prefetched past it is empty
+                    for task in pending:
+                        task.cancel()
+                    pending.clear()
+                else:
+                    schedule()
+                for item in items:
+                    yield item
+        finally:
+            # Also reached when the consumer breaks out early
+            for task in pending:
+                task.cancel()
+
+    async def flatten(self) -> List[T]:
+        """Collects every item into a list. Defeats the point for large listings."""
+        return [item async for item in self]
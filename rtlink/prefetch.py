@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .bot import Bot
+    from .types import Comment
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Starts looking up the forum and parent comment of a new comment as soon as the RTE event
+    is decoded, before any handler runs. A handler calling
+    [`Bot.fetch_forum`][rtlink.bot.Bot.fetch_forum] or [`Bot.fetch_comment`][rtlink.bot.Bot.fetch_comment]
+    then finds the result in the cache, or joins the request that is already in flight.
+
+    Hit rates end up in `bot.metrics` as `lookup.forum.*` and `lookup.comment.*` (`hit`,
+    `joined` or `miss`), prefetches as `prefetch.*` (`issued`, `skipped`, `errors`).
+
+    ```py
+    bot = Bot(prefetch=Prefetcher(parents=False))
+    ...
+    print(bot.metrics.hit_rate("lookup.forum"))
+    ```
+
+    Args:
+        forums: Prefetch `Comment.forum_id`.
+        parents: Prefetch `Comment.reply_to`.
+        max_inflight: Prefetches running at once. Further ones are skipped, so a comment storm
+            doesn't turn into a request storm.
+    """
+
+    def __init__(
+        self, forums: bool = True, parents: bool = True, max_inflight: int = 32
+    ):
+        self.forums = forums
+        self.parents = parents
+        self.max_inflight = max_inflight
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def _set_bot(self, bot: Bot):
+        self.bot = bot
+
+    def prefetch(self, comment: Comment):
+        client = self.bot._client
+        if self.forums and comment.forum_id:
+            self._start(
+                ("forum", comment.forum_id),
+                lambda: client.get_cache(comment.forum_id),
+                lambda: client.fetch_forum(id=comment.forum_id),
+            )
+        if self.parents and comment.reply_to:
+            self._start(
+                ("comment", comment.reply_to),
+                lambda: client.get_cached_comment(comment.reply_to),  # type: ignore
+                lambda: client.fetch_comment(comment.reply_to),  # type: ignore
+            )
+
+    def inflight(self, kind: str, key: str) -> Optional[asyncio.Task]:
+        return self._inflight.get((kind, key))
+
+    def _start(
+        self,
+        key: Tuple[str, str],
+        cached: Callable[[], Awaitable[Any]],
+        fetch: Callable[[], Awaitable[Any]],
+    ):
+        if key in self._inflight:
+            return
+        if len(self._inflight) >= self.max_inflight:
+            self.bot.metrics.incr("prefetch.skipped")
+            return
+        task = asyncio.ensure_future(self._run(key, cached, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _run(
+        self,
+        key: Tuple[str, str],
+        cached: Callable[[], Awaitable[Any]],
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if (r := await cached()) is not None:
+            return r
+        self.bot.metrics.incr("prefetch.issued")
+        try:
+            return await fetch()
+        except Exception as e:
+            # The handler's own lookup will try again and surface the error
+            logger.debug("Prefetch of %s %s failed: %s", *key, e)
+            self.bot.metrics.incr("prefetch.errors")
+            return None
+
+    def cancel(self):
+        for task in self._inflight.values():
+            task.cancel()
@@ -0,0 +1,235 @@
+"""GraphQL documents and selection sets shared by the HTTP client.
+
+Documents are parsed once at import instead of on every request.
+"""
+
+from gql import gql
+
+COMMENT_MINIMAL_FIELDS = """
+    id
+    content
+    commenterId
+    forumId
+    replyTo
+    postId
+    createdAt
+"""
+
+COMMENT_STANDARD_FIELDS = (
+    COMMENT_MINIMAL_FIELDS
+    + """
+    modifiedAt
+    replyCount
+    upvotes
+    downvotes
+"""
+)
+
+COMMENT_FIELDS = """
+    id
+    content
+    commenterId
+    forumId
+    replyTo
+    postId
+    commenter {
+        id
+        username
+        displayName
+        bio
+        pfp {
+            loc
+        }
+        banner  {
+            loc
+        }
+        createdAt
+        modifiedAt
+        admin
+        bot
+    }
+    createdAt
+    modifiedAt
+    replyCount
+    upvotes
+    downvotes
+    upvotedBy
+    downvotedBy
+"""
+
+FORUM_FIELDS = """
+    id
+    name
+    displayName
+    description
+    icon {
+        loc
+    }
+    banner {
+        loc
+    }
+    postCount
+    createdAt
+    modifiedAt
+    ownerId
+    moderators
+    bannedMembers
+    locked
+"""
+
+POST_FIELDS = """
+    id
+    title
+    content
+    posterId
+    forumId
+    tags
+    createdAt
+    modifiedAt
+    upvotes
+    downvotes
+"""
+
+# Selection sets callers can pick with `fields=` on comment creating calls
+COMMENT_PROFILES = {
+    "minimal": COMMENT_MINIMAL_FIELDS,
+    "standard": COMMENT_STANDARD_FIELDS,
+    "full": COMMENT_FIELDS,
+}
+
+GET_COMMENTS_QUERY = gql(
+    """
+    query($postId: String!, $page: Int!, $perPage: Int!) {
+        getComments(postId: $postId, page: $page, perPage: $perPage) {
+            %s
+        }
+    }
+    """
+    % COMMENT_FIELDS
+)
+
+GET_COMMENT_QUERY = gql(
+    """
+    query($id: String!) {
+        getComment(id: $id) {
+            %s
+        }
+    }
+    """
+    % COMMENT_FIELDS
+)
+
+GET_POSTS_QUERY = gql(
+    """
+    query($forumId: String!, $page: Int!, $perPage: Int!) {
+        getPosts(forumId: $forumId, page: $page, perPage: $perPage) {
+            %s
+        }
+    }
+    """
+    % POST_FIELDS
+)
+
+GET_FORUMS_QUERY = gql(
+    """
+    query($page: Int!, $perPage: Int!) {
+        getForums(page: $page, perPage: $perPage) {
+            %s
+        }
+    }
+    """
+    % FORUM_FIELDS
+)
+
+VERSION_QUERY = gql(
+    """
+    query {
+       version {
+            major
+            minor
+            bugFix
+            rte
+            vc
+            versionString
+       }
+    }
+    """
+)
+
+USER_FIELDS = """
+    id
+    username
+    displayName
+    bio
+    pfp {
+        loc
+    }
+    banner  {
+        loc
+    }
+    createdAt
+    modifiedAt
+    admin
+    bot
+"""
+
+LOGIN_MUTATION = gql(
+    """
+    mutation($email: String!, $password: String!) {
+        login(email: $email, password: $password) {
+            %s
+        }
+    }
+    """
+    % USER_FIELDS
+)
+
+# The logged in user, cheap enough to check whether a saved session is still valid
+ME_QUERY = gql(
+    """
+    query {
+        me {
+            %s
+        }
+    }
+    """
+    % USER_FIELDS
+)
+
+GET_FORUM_QUERY = gql(
+    """
+    query($id: String, $name: String) {
+        getForum(id: $id, name: $name) {
+            %s
+        }
+    }
+    """
+    % FORUM_FIELDS
+)
+
+LOGOUT_MUTATION = gql(
+    """
+    mutation {
+        logout {
+            msg
+        }
+    }
+    """
+)
+
+CREATE_COMMENT_MUTATIONS = {
+    profile: gql(
+        """
+        mutation($postId: String!, $content: String!, $replyTo: String) {
+            createComment(postId: $postId, content: $content, replyTo: $replyTo) {
+                %s
+            }
+        }
+        """
+        % fields
+    )
+    for profile, fields in COMMENT_PROFILES.items()
+}
+
+# Root fields of read only queries that are safe to send as (cacheable) GET requests
+CACHEABLE_OPERATIONS = ("getForum", "version")
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional, Hashable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .types import Comment
+
+
+class RateLimit:
+    """A rate specification: `count` tokens every `per` seconds.
+
+    Args:
+        count: Number of allowed actions per period.
+        per: Length of the period in seconds.
+        burst: Bucket capacity. Defaults to `count`.
+    """
+
+    def __init__(self, count: int, per: float, burst: Optional[int] = None):
+        self.count = count
+        self.per = per
+        self.burst = burst or count
+
+    def bucket(self) -> TokenBucket:
+        return TokenBucket(self.count / self.per, self.burst)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def consume(self, n: float = 1):
+        self.tokens -= n
+
+    def try_acquire(self, n: float = 1) -> bool:
+        if self.available() >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    async def acquire(self, n: float = 1):
+        """Waits until `n` tokens are available and takes them."""
+        while not self.try_acquire(n):
+            await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class KeyedRateLimiter:
+    """One token bucket per key. The least recently used buckets are evicted past `max_keys`,
+    an evicted key simply starts again with a full bucket."""
+
+    def __init__(self, limit: RateLimit, max_keys: int = 10_000):
+        self.limit = limit
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        if bucket := self._buckets.get(key):
+            self._buckets.move_to_end(key)
+            return bucket
+        bucket = self._buckets[key] = self.limit.bucket()
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return bucket
+
+
+class InboundRateLimiter:
+    """Limits how often the bot processes commands, per commenter, per post and globally.
+
+    A comment is only allowed when every configured scope has a token left, and only then are
+    tokens taken from each of them.
+
+    Args:
+        user: Limit per commenter.
+        post: Limit per post.
+        global_: Limit across all comments.
+    """
+
+    def __init__(
+        self,
+        user: Optional[RateLimit] = None,
+        post: Optional[RateLimit] = None,
+        global_: Optional[RateLimit] = None,
+    ):
+        self._user = KeyedRateLimiter(user) if user else None
+        self._post = KeyedRateLimiter(post) if post else None
+        self._global = global_.bucket() if global_ else None
+        self.rejected = 0
+
+    def allow(self, comment: Comment) -> bool:
+        buckets = []
+        if self._global:
+            buckets.append(self._global)
+        if self._post:
+            buckets.append(self._post.get(comment.post_id))
+        if self._user:
+            buckets.append(self._user.get(comment.commenter_id))
+        if all(bucket.available() >= 1 for bucket in buckets):
+            for bucket in buckets:
+                bucket.consume()
+            return True
+        self.rejected += 1
+        return False
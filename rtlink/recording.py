@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import os
+import re
+import time
+import wave
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+    TYPE_CHECKING,
+)
+
+import av
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Sink:
+    """Destination of one speaker's audio. Receives signed 16 bit interleaved PCM.
+
+    Subclass it to send audio somewhere else than [`WavSink`][rtlink.recording.WavSink] and
+    [`CallbackSink`][rtlink.recording.CallbackSink] do. Calls come from a single task per
+    speaker, one at a time, so a sink needs no locking. A slow sink only makes that speaker's
+    buffer drop frames.
+
+    Blocking work belongs in [`run_in_executor`][rtlink.recording.Sink.run_in_executor].
+    """
+
+    # Set by the Recorder that created the sink, when its VC client belongs to a bot
+    _bot: Optional[Bot] = None
+
+    async def run_in_executor(self, fn: Callable[..., T], *args) -> T:
+        """Runs a blocking call in the bot's thread executor, or in the loop's default executor
+        for a sink used without a bot."""
+        if self._bot is not None:
+            return await self._bot.run_in_executor(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def open(self, sample_rate: int, channels: int):
+        pass
+
+    async def write(self, pcm: bytes):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class WavSink(Sink):
+    """Writes a WAV file. Audio is collected into chunks of `chunk_size` bytes, each written
+    from a worker thread, so disk latency never stalls the event loop.
+
+    Args:
+        path: File to write, replaced if it exists.
+        chunk_size: Bytes buffered before a write.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 64 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._file: Optional[wave.Wave_write] = None
+
+    async def open(self, sample_rate: int, channels: int):
+        def _open():
+            f = wave.open(self.path, "wb")
+            f.setnchannels(channels)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            return f
+
+        self._file = await self.run_in_executor(_open)
+
+    async def write(self, pcm: bytes):
+        self._buffer += pcm
+        if len(self._buffer) >= self.chunk_size:
+            await self._flush()
+
+    async def _flush(self):
+        if self._file is None or not self._buffer:
+            return
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        await self.run_in_executor(self._file.writeframesraw, chunk)
+
+    async def close(self):
+        await self._flush()
+        if self._file is not None:
+            # Patches the header with the final length
+            await self.run_in_executor(self._file.close)
+            self._file = None
+
+
+class CallbackSink(Sink):
+    """Hands audio to a function for live processing, e.g. speech recognition.
+
+    ```py
+    def on_audio(speaker: str, pcm: bytes, sample_rate: int, channels: int):
+        ...
+
+    recorder = Recorder(lambda speaker: CallbackSink(functools.partial(on_audio, speaker)))
+    ```
+
+    Args:
+        fn: Called with `(pcm, sample_rate, channels)`. Coroutine functions are awaited, plain
+            functions run in the bot's thread executor.
+    """
+
+    def __init__(self, fn: Callable[[bytes, int, int], Any]):
+        self.fn = fn
+        self._format: Tuple[int, int] = (0, 0)
+
+    async def open(self, sample_rate: int, channels: int):
+        self._format = (sample_rate, channels)
+
+    async def write(self, pcm: bytes):
+        if inspect.iscoroutinefunction(self.fn):
+            await self.fn(pcm, *self._format)
+        else:
+            await self.run_in_executor(self.fn, pcm, *self._format)
+
+
+class _Ring:
+    """Bounded frame buffer between a track and its sink. Full, it drops the oldest frame: in
+    live audio a gap is better than ever growing delay."""
+
+    def __init__(self, capacity: int):
+        self._frames: Deque[bytes] = deque(maxlen=capacity)
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, frame: bytes) -> bool:
+        """Buffers a frame, returns whether an old one had to go for it."""
+        dropped = len(self._frames) == self._frames.maxlen
+        if dropped:
+            self.dropped += 1
+        self._frames.append(frame)
+        self._ready.set()
+        return dropped
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def drain(self) -> Optional[bytes]:
+        """Everything buffered as one chunk, `None` once closed and empty."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        chunk = b"".join(self._frames)
+        self._frames.clear()
+        return chunk
+
+
+class _Stream:
+    def __init__(
+        self, speaker: str, track: MediaStreamTrack, sink: Sink, capacity: int
+    ):
+        self.speaker = speaker
+        self.track = track
+        self.sink = sink
+        self.ring = _Ring(capacity)
+        self.frames = 0
+        self.tasks: Tuple[asyncio.Task, ...] = ()
+
+
+def _safe_name(speaker: str) -> str:
+    return re.sub(r"[^\w.-]", "_", speaker) or "_"
+
+
+class Recorder:
+    """Records what every speaker in a VC says, into one sink per speaker.
+
+    A task per speaker pulls decoded frames off the track into a ring buffer of `buffer_frames`
+    frames, a second one drains the buffer into the sink. Decoding and signalling never wait on
+    the sink, and a sink that can't keep up loses its oldest audio instead of buffering without
+    bound. Frame and drop counts are in [`stats`][rtlink.recording.Recorder.stats] and, when the
+    VC client belongs to a bot, in `bot.metrics` as `vc.recv.frames` and `vc.recv.dropped`.
+
+    ```py
+    vc = VcClient(bot, bot.vc_url, "lounge", recorder=Recorder("recordings"))
+    ```
+
+    Args:
+        sink: A directory to write a WAV file per speaker to, or a function that returns the
+            [`Sink`][rtlink.recording.Sink] for a speaker.
+        buffer_frames: Frames buffered per speaker. Frames are 20ms, the default holds 5s.
+    """
+
+    def __init__(
+        self,
+        sink: Union[str, Callable[[str], Sink]],
+        buffer_frames: int = 250,
+    ):
+        if isinstance(sink, str):
+            directory = sink
+            os.makedirs(directory, exist_ok=True)
+            sink = lambda speaker: WavSink(
+                os.path.join(
+                    directory, "{}-{}.wav".format(_safe_name(speaker), int(time.time()))
+                )
+            )
+        self.sink_factory: Callable[[str], Sink] = sink
+        self.buffer_frames = buffer_frames
+        self.bot: Optional[Bot] = None
+        self._streams: Dict[str, _Stream] = {}
+        # Streams replaced by add, still flushing their sinks
+        self._stopping: Set[asyncio.Task] = set()
+
+    def _set_bot(self, bot: Bot):
+        self.bot = bot
+
+    def __contains__(self, speaker: str) -> bool:
+        return speaker in self._streams
+
+    def add(self, speaker: str, track: MediaStreamTrack):
+        """Starts recording a track. A speaker that is already recorded switches to the new
+        track and a new sink."""
+        if old := self._streams.pop(speaker, None):
+            task = asyncio.ensure_future(self._stop(old))
+            self._stopping.add(task)
+            task.add_done_callback(self._stopping.discard)
+        sink = self.sink_factory(speaker)
+        sink._bot = self.bot
+        stream = _Stream(speaker, track, sink, self.buffer_frames)
+        self._streams[speaker] = stream
+        stream.tasks = (
+            asyncio.create_task(self._read(stream)),
+            asyncio.create_task(self._write(stream)),
+        )
+
+    async def remove(self, speaker: str):
+        """Stops recording a speaker, flushing what is buffered to the sink."""
+        if stream := self._streams.pop(speaker, None):
+            await self._stop(stream)
+
+    async def _stop(self, stream: _Stream):
+        reader, writer = stream.tasks
+        reader.cancel()
+        stream.ring.close()
+        for result in await asyncio.gather(reader, writer, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error("Recording of %s failed: %s", stream.speaker, result)
+
+    async def close(self):
+        """Stops every recording, including replaced ones still being flushed."""
+        await asyncio.gather(
+            *(self.remove(s) for s in list(self._streams)), *list(self._stopping)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Frames received and dropped so far, by speaker."""
+        return {
+            speaker: {"frames": s.frames, "dropped": s.ring.dropped}
+            for speaker, s in self._streams.items()
+        }
+
+    async def _read(self, stream: _Stream):
+        resampler: Optional[av.AudioResampler] = None
+        opened = False
+        try:
+            while True:
+                frame = await stream.track.recv()
+                if not opened:
+                    # The sink learns the format from the first frame, later frames are
+                    # converted to it
+                    rate, layout = frame.sample_rate, frame.layout.name
+                    resampler = av.AudioResampler(
+                        format="s16", layout=layout, rate=rate
+                    )
+                    await stream.sink.open(rate, len(frame.layout.channels))
+                    opened = True
+                dropped = False
+                for out in resampler.resample(frame):  # type: ignore
+                    # Planes are padded, only the samples themselves are audio
+                    pcm = bytes(out.planes[0])[
+                        : out.samples * len(out.layout.channels) * 2
+                    ]
+                    dropped = stream.ring.put(pcm) or dropped
+                stream.frames += 1
+                if self.bot is not None:
+                    self.bot.metrics.incr("vc.recv.frames")
+                    if dropped:
+                        self.bot.metrics.incr("vc.recv.dropped")
+                if dropped and stream.ring.dropped == 1:
+                    logger.warn(
+                        "Recording of {} can't keep up, dropping audio".format(
+                            stream.speaker
+                        )
+                    )
+        except MediaStreamError:
+            pass
+        finally:
+            stream.ring.close()
+
+    async def _write(self, stream: _Stream):
+        try:
+            while (chunk := await stream.ring.drain()) is not None:
+                await stream.sink.write(chunk)
+        except Exception as e:
+            logger.error("Recording of %s failed: %s", stream.speaker, e)
+            stream.track.stop()
+        finally:
+            await stream.sink.close()
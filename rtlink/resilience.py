@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+from weakref import WeakKeyDictionary
+
+import aiohttp
+from gql.transport.exceptions import TransportProtocolError, TransportServerError
+from graphql import DocumentNode, OperationDefinitionNode
+
+from .errors import CircuitOpenError
+
+T = TypeVar("T")
+logger = logging.getLogger(__name__)
+
+# Errors that say nothing about the request itself, trying again may succeed
+_TRANSIENT = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+    TransportProtocolError,
+)
+# Errors raised before the request left the client, so retrying a mutation can't apply it twice
+_NOT_SENT = (aiohttp.ClientConnectorError,)
+
+
+def is_transient(e: BaseException) -> bool:
+    if isinstance(e, TransportServerError):
+        # 4xx other than 429 are the request's fault
+        return e.code is None or e.code == 429 or e.code >= 500
+    return isinstance(e, _TRANSIENT)
+
+
+def was_not_sent(e: BaseException) -> bool:
+    return isinstance(e, _NOT_SENT)
+
+
+_operations: WeakKeyDictionary[DocumentNode, Tuple[str, bool]] = WeakKeyDictionary()
+
+
+def operation_of(document: DocumentNode) -> Tuple[str, bool]:
+    """The root field of a document and whether it is a query."""
+    if (op := _operations.get(document)) is None:
+        definition = next(
+            d for d in document.definitions if isinstance(d, OperationDefinitionNode)
+        )
+        op = _operations[document] = (
+            definition.selection_set.selections[0].name.value,  # type: ignore
+            definition.operation.value == "query",
+        )
+    return op
+
+
+class RetryPolicy:
+    """How a GraphQL operation is retried when the request fails in a way that isn't the
+    request's fault (connection errors, timeouts, 5xx and 429 responses). GraphQL errors are never
+    retried.
+
+    Args:
+        attempts: Total number of tries, including the first one.
+        base_delay: Backoff before the first retry in seconds, doubled for every further retry.
+            The actual sleep is picked uniformly between 0 and the backoff (full jitter) so that
+            clients don't retry in lockstep.
+        max_delay: Upper bound of the backoff.
+        timeout: Seconds a single try may take. `None` waits as long as aiohttp does.
+        idempotent: Whether the operation may run twice. Defaults to `True` for queries and
+            `False` for mutations, which are then only retried when the request never left the
+            client.
+        hedge: For idempotent operations, send a second identical request when the first one is
+            slower than the 95th percentile of recent calls, and use whichever answers first.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 2,
+        timeout: Optional[float] = 10,
+        idempotent: Optional[bool] = None,
+        hedge: bool = False,
+    ):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.idempotent = idempotent
+        self.hedge = hedge
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+class CircuitBreaker:
+    """Fails calls fast while the API is down instead of piling more requests onto it.
+
+    After `failure_threshold` consecutive transient failures the circuit opens and every call
+    raises [`CircuitOpenError`][rtlink.errors.CircuitOpenError] right away. After `reset_timeout`
+    seconds a single call is let through as a probe, it closes the circuit again when it succeeds.
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds the circuit stays open before probing.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_call(self) -> bool:
+        """Raises while the circuit is open. Returns whether the call is the probe."""
+        if self.opened_at is None:
+            return False
+        retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+        if retry_in > 0 or self._probing:
+            raise CircuitOpenError(
+                "API circuit is open, retrying in {:.1f}s".format(max(retry_in, 0))
+            )
+        self._probing = True
+        return True
+
+    def after_call(self, probe: bool, failed: Optional[bool]):
+        """Records the outcome of a call. `None` means the outcome says nothing about the API,
+        for example when the call was cancelled."""
+        if probe:
+            self._probing = False
+        if failed is None:
+            return
+        if not failed:
+            if self.opened_at is not None:
+                logger.info("API is reachable again, closing circuit")
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if probe or (
+            self.opened_at is None and self.failures >= self.failure_threshold
+        ):
+            if self.opened_at is None:
+                logger.warn(
+                    "Opening API circuit after {} failures".format(self.failures)
+                )
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Recent latencies per operation, used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, operation: str, seconds: float):
+        if (samples := self._samples.get(operation)) is None:
+            samples = self._samples[operation] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, operation: str, q: float = 0.95) -> Optional[float]:
+        samples = self._samples.get(operation)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return sorted(samples)[int(q * (len(samples) - 1))]
+
+
+async def hedged(fn: Callable[[], Awaitable[T]], delay: float) -> T:
+    """Runs `fn`, and runs it a second time if the first call hasn't finished after `delay`
+    seconds. Returns the first successful result and cancels the other call."""
+    tasks = {asyncio.ensure_future(fn())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            logger.debug("Hedging request after %.3fs", delay)
+            tasks.add(asyncio.ensure_future(fn()))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if (error := task.exception()) is None:
+                    return task.result()
+        raise error  # type: ignore
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_with_policy(
+    operation: str,
+    fn: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    idempotent: bool,
+    breaker: Optional[CircuitBreaker],
+    latencies: LatencyTracker,
+) -> Any:
+    retry = 0
+    while True:
+        probe = breaker.before_call() if breaker else False
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(policy.timeout):
+                delay = latencies.percentile(operation) if policy.hedge else None
+                if idempotent and delay is not None:
+                    result = await hedged(fn, delay)
+                else:
+                    result = await fn()
+        except asyncio.CancelledError:
+            if breaker:
+                breaker.after_call(probe, None)
+            raise
+        except Exception as e:
+            transient = is_transient(e)
+            if breaker:
+                # A GraphQL error means the API is up and answering
+                breaker.after_call(probe, transient)
+            retry += 1
+            if (
+                not transient
+                or retry >= policy.attempts
+                or not (idempotent or was_not_sent(e))
+            ):
+                raise
+            logger.warn(
+                'Retrying "{}" after {} ({}/{})'.format(
+                    operation, type(e).__name__, retry, policy.attempts - 1
+                )
+            )
+            await asyncio.sleep(policy.backoff(retry - 1))
+            continue
+        if breaker:
+            breaker.after_call(probe, False)
+        latencies.record(operation, time.monotonic() - start)
+        return result
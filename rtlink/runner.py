@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple, TYPE_CHECKING
+
+import aiohttp
+from aiocache import Cache, BaseCache
+from graphql import GraphQLSchema
+
+from .utils import run
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+logger = logging.getLogger(__name__)
+
+
+class SharedResources:
+    """Resources that several [`HTTPClient`][rtlink.http.HTTPClient]s talking to the same server
+    can share. Cookies are never shared, every client keeps its own jar.
+
+    Args:
+        limit: Total number of simultaneous connections in the shared pool.
+        limit_per_host: Simultaneous connections per host. 0 means no limit.
+        cache: Entity cache for server wide objects like forums. Defaults to an in-memory cache.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        cache: Optional[BaseCache] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.cache: BaseCache = cache or Cache()
+        self.schema: Optional[GraphQLSchema] = None
+        self.schema_lock = asyncio.Lock()
+        self._connector: Optional[aiohttp.TCPConnector] = None
+
+    def get_connector(self) -> aiohttp.TCPConnector:
+        # Created on first use so that it binds to the running loop
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+        return self._connector
+
+    async def close(self):
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+
+class BotRunner:
+    """Runs several bots in one event loop, sharing one connection pool, the GraphQL schema and
+    the entity cache between them.
+
+    ```py
+    runner = BotRunner()
+    runner.add(music_bot, os.getenv("MUSIC_TOKEN"))
+    runner.add(mod_bot, os.getenv("MOD_TOKEN"))
+    runner.run()
+    ```
+
+    Args:
+        resources: The resources to share. A new set is created by default.
+    """
+
+    def __init__(self, resources: Optional[SharedResources] = None):
+        self.resources = resources or SharedResources()
+        self.bots: List[Tuple[Bot, str]] = []
+
+    def add(self, bot: Bot, token: str):
+        """Adds a bot to the runner. Must be called before the runner is started."""
+        bot._client.use_shared(self.resources)
+        self.bots.append((bot, token))
+
+    async def start(self):
+        """Non-blocking entry point, starts every bot and returns once all of them stopped.
+        A bot that fails doesn't take the others down with it."""
+        try:
+            results = await asyncio.gather(
+                *(bot.start(token) for bot, token in self.bots),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error("Bot stopped with an exception", exc_info=result)
+        finally:
+            await self.resources.close()
+
+    def run(self, **loop_options: Any):
+        """Blocking call to run every bot. Use [`BotRunner.start`][rtlink.runner.BotRunner.start]
+        for a nonblocking call. `loop_options` are passed to [`rtlink.utils.run`][rtlink.utils.run].
+        """
+        run(self.start(), **loop_options)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+logger = logging.getLogger(__name__)
+
+# 64 slots per level, 4 levels: with the default 0.1s resolution the wheels cover 19 days
+_BITS = 6
+_SLOTS = 1 << _BITS
+_MASK = _SLOTS - 1
+_LEVELS = 4
+
+
+class Timer:
+    """A pending call. Returned by [`Bot.schedule_at`][rtlink.bot.Bot.schedule_at] and
+    [`Bot.loop`][rtlink.bot.Bot.loop].
+
+    Attributes:
+        when: Unix timestamp of the next run.
+        interval: Seconds between runs of a loop, `None` for one-off timers.
+    """
+
+    __slots__ = (
+        "id",
+        "when",
+        "fn",
+        "args",
+        "interval",
+        "jitter",
+        "overlap",
+        "persist",
+        "cancelled",
+        "_tick",
+        "_base",
+        "_task",
+        "_queued",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        when: float,
+        fn: Callable,
+        args: Tuple[Any, ...],
+        interval: Optional[float] = None,
+        jitter: float = 0,
+        overlap: str = "skip",
+        persist: bool = False,
+    ):
+        self.id = id
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.interval = interval
+        self.jitter = jitter
+        self.overlap = overlap
+        self.persist = persist
+        self.cancelled = False
+        self._tick = 0
+        self._base = when
+        self._task: Optional[asyncio.Task] = None
+        self._queued = False
+
+    def cancel(self):
+        """Stops the timer. A run that already started isn't interrupted."""
+        self.cancelled = True
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+
+class Scheduler:
+    """Runs delayed and periodic calls off a single hierarchical timer wheel.
+
+    Adding and cancelling a timer is O(1) and one driver task serves every timer, so tens of
+    thousands of pending reminders cost a few dicts, not a task and a sleeping coroutine each.
+    Timers fire on the first tick after their deadline, `resolution` is the tick length.
+
+    Args:
+        bot: The bot whose task set runs the calls, so shutdown drains them.
+        resolution: Tick length in seconds.
+    """
+
+    def __init__(self, bot: Bot, resolution: float = 0.1):
+        self.bot = bot
+        self.resolution = resolution
+        self._origin = time.time()
+        self._tick = 0
+        self._wheels: List[List[Dict[int, Timer]]] = [
+            [{} for _ in range(_SLOTS)] for _ in range(_LEVELS)
+        ]
+        self._overflow: Dict[int, Timer] = {}
+        self._ids = itertools.count()
+        self._count = 0
+        self._wakeup = asyncio.Event()
+        self._driver: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(
+        self,
+        when: Union[datetime, float],
+        fn: Callable,
+        *args: Any,
+        interval: Optional[float] = None,
+        jitter: float = 0,
+        overlap: str = "skip",
+        persist: bool = False,
+    ) -> Timer:
+        if overlap not in ("skip", "queue"):
+            raise ValueError('Unknown overlap policy "{}"'.format(overlap))
+        if persist and "<locals>" in fn.__qualname__:
+            raise ValueError("Persisted timers need a module level function")
+        if isinstance(when, datetime):
+            when = when.timestamp()
+        if interval is not None:
+            when += random.uniform(0, jitter)
+        timer = Timer(
+            next(self._ids), when, fn, args, interval, jitter, overlap, persist
+        )
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer: Timer):
+        if not self._count:
+            # Nothing is pending, skip the idle ticks instead of stepping through them
+            self._tick = max(self._tick, self._current_tick())
+        target = math.ceil((timer.when - self._origin) / self.resolution)
+        # Due timers go into the next tick, the current one has been processed already
+        timer._tick = max(target, self._tick + 1)
+        self._place(timer, self._tick)
+        self._count += 1
+        self._wakeup.set()
+
+    def _current_tick(self) -> int:
+        return math.floor((time.time() - self._origin) / self.resolution)
+
+    def _place(self, timer: Timer, now: int):
+        # The lowest level whose higher digits are the same for both ticks holds the timer.
+        # Its digit there is ahead of now's, so the slot cascades down before the timer is due.
+        for level in range(_LEVELS):
+            shift = _BITS * (level + 1)
+            if timer._tick >> shift == now >> shift:
+                slot = (timer._tick >> (_BITS * level)) & _MASK
+                self._wheels[level][slot][timer.id] = timer
+                return
+        self._overflow[timer.id] = timer
+
+    def _advance(self, tick: int) -> List[Timer]:
+        self._tick = tick
+        if tick % (1 << (_BITS * _LEVELS)) == 0:
+            overflow, self._overflow = self._overflow, {}
+            for timer in overflow.values():
+                self._place(timer, tick)
+        for level in range(_LEVELS - 1, 0, -1):
+            if tick % (1 << (_BITS * level)) == 0:
+                slot = (tick >> (_BITS * level)) & _MASK
+                timers, self._wheels[level][slot] = self._wheels[level][slot], {}
+                for timer in timers.values():
+                    self._place(timer, tick)
+        due, self._wheels[0][tick & _MASK] = self._wheels[0][tick & _MASK], {}
+        self._count -= len(due)
+        return [timer for timer in due.values() if not timer.cancelled]
+
+    def start(self):
+        if self._driver is None:
+            self._driver = asyncio.create_task(self._drive())
+
+    async def stop(self):
+        if self._driver is not None:
+            self._driver.cancel()
+            await asyncio.gather(self._driver, return_exceptions=True)
+            self._driver = None
+
+    async def _drive(self):
+        while True:
+            if not self._count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            now = self._current_tick()
+            while self._tick < now:
+                for timer in self._advance(self._tick + 1):
+                    self._fire(timer)
+            next_tick = self._origin + (self._tick + 1) * self.resolution
+            await asyncio.sleep(max(next_tick - time.time(), 0))
+
+    def _fire(self, timer: Timer):
+        if timer.interval is None:
+            self._run(timer)
+            return
+        if timer.running:
+            if timer.overlap == "queue":
+                timer._queued = True
+            else:
+                logger.debug(
+                    "Skipping run of %s, the previous one is still going", timer.fn
+                )
+        else:
+            self._run(timer)
+        # Fixed rate, but never try to catch up on missed runs. Jitter doesn't accumulate.
+        timer._base = max(timer._base + timer.interval, time.time())
+        timer.when = timer._base + random.uniform(0, timer.jitter)
+        self._insert(timer)
+
+    def _run(self, timer: Timer):
+        if asyncio.iscoroutinefunction(timer.fn):
+            coro = timer.fn(*timer.args)
+        else:
+            coro = self.bot.run_in_executor(timer.fn, *timer.args)
+        timer._task = self.bot._spawn(coro)
+        if timer.interval is not None:
+            timer._task.add_done_callback(lambda _: self._run_queued(timer))
+
+    def _run_queued(self, timer: Timer):
+        if timer._queued and not timer.cancelled and not self.bot.is_closed():
+            timer._queued = False
+            self._run(timer)
+
+    def pending(self) -> List[Timer]:
+        timers = [t for level in self._wheels for slot in level for t in slot.values()]
+        timers.extend(self._overflow.values())
+        return [t for t in timers if not t.cancelled]
+
+    def save(self, path: str):
+        """Writes pending one-off timers created with `persist=True` to `path` as JSON.
+        Their function is stored by import path, so it has to be a module level function, and
+        their arguments have to be JSON serializable."""
+        entries = []
+        for timer in self.pending():
+            if not timer.persist or timer.interval is not None:
+                continue
+            entries.append(
+                {
+                    "when": timer.when,
+                    "fn": "{}:{}".format(timer.fn.__module__, timer.fn.__qualname__),
+                    "args": list(timer.args),
+                }
+            )
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+        logger.info("Saved %d pending timers to %s", len(entries), path)
+
+    def load(self, path: str):
+        """Schedules timers saved by [`save`][rtlink.scheduler.Scheduler.save]. Timers that came
+        due while the bot was down run right away."""
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            module, _, qualname = entry["fn"].partition(":")
+            try:
+                fn: Any = importlib.import_module(module)
+                for attr in qualname.split("."):
+                    fn = getattr(fn, attr)
+            except (ImportError, AttributeError):
+                logger.warn("Dropping saved timer, can't find {}".format(entry["fn"]))
+                continue
+            self.add(entry["when"], fn, *entry["args"], persist=True)
+        logger.info("Restored %d timers from %s", len(entries), path)
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import struct
+import tempfile
+import zlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TYPE_CHECKING
+
+from websockets.client import connect
+
+from .options import WebsocketOptions
+from .utils import setup_logging, run
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+logger = logging.getLogger(__name__)
+
+# Every frame on the IPC socket is a 4 byte big endian length followed by the raw RTE message
+_HEADER = struct.Struct(">I")
+
+
+def shard_for(msg: dict, shards: int) -> int:
+    """The worker an RTE event goes to. Events of one post always land on the same worker, which
+    handles them in order."""
+    post_id = (msg.get("item") or {}).get("post_id")
+    if not post_id:
+        return 0
+    return zlib.crc32(post_id.encode()) % shards
+
+
+async def _read_frames(reader: asyncio.StreamReader):
+    while True:
+        try:
+            header = await reader.readexactly(_HEADER.size)
+            (length,) = _HEADER.unpack(header)
+            yield await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return
+
+
+class _PostOrder:
+    """Handles the events of each post one at a time, in arrival order. Events of different
+    posts still run concurrently. A post only has a queue while it has events pending.
+
+    At most `limit` events are queued or running. `submit` waits for a slot, so the reader stops
+    reading while the bot is behind and events back up in the socket instead of in memory.
+    """
+
+    def __init__(self, bot: Bot, limit: int):
+        self.bot = bot
+        self._slots = asyncio.Semaphore(limit)
+        self._queues: Dict[str, Deque[dict]] = {}
+
+    async def submit(self, msg: dict):
+        await self._slots.acquire()
+        post_id = (msg.get("item") or {}).get("post_id")
+        if not post_id:
+            if task := self.bot._handle_event(msg):
+                task.add_done_callback(lambda _: self._slots.release())
+            else:
+                self._slots.release()
+        elif (queue := self._queues.get(post_id)) is not None:
+            queue.append(msg)
+        else:
+            self._queues[post_id] = deque([msg])
+            self.bot._spawn(self._drain(post_id))
+
+    async def _drain(self, post_id: str):
+        queue = self._queues[post_id]
+        try:
+            while queue:
+                try:
+                    if task := self.bot._handle_event(queue.popleft()):
+                        # Handler errors are logged by the bot, they must not stop the queue
+                        await asyncio.wait([task])
+                finally:
+                    self._slots.release()
+        finally:
+            # Cancelled on shutdown, the events still queued are dropped
+            for _ in queue:
+                self._slots.release()
+            del self._queues[post_id]
+
+
+async def _run_worker(bot: Bot, token: str, path: str, index: int):
+    await bot._login(token, rte=False)
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(_HEADER.pack(index))
+    await writer.drain()
+    logger.info("Worker %d is receiving events", index)
+    try:
+        async for frame in _read_frames(reader):
+            await bot._order.submit(json.loads(frame))
+    except asyncio.CancelledError:
+        pass
+    finally:
+        writer.close()
+        await bot._shutdown()
+
+
+def _worker_main(
+    factory: Callable[[], Bot],
+    token: str,
+    path: str,
+    index: int,
+    loop_options: Dict[str, Any],
+):
+    bot = factory()
+    try:
+        run(_run_worker(bot, token, path, index), **loop_options)
+    except KeyboardInterrupt:
+        # The ingest process owns shutdown, it closes the socket which ends the worker
+        pass
+
+
+class ShardedRunner:
+    """Spreads one bot over several processes.
+
+    The calling process only holds the RTE websocket and forwards every event, unparsed apart from
+    reading its post ID, to one of `workers` worker processes over a Unix socket. Events are
+    sharded by post ID, and a worker handles the events of a post one at a time, so they are
+    handled in order. Different posts are handled concurrently. Each worker builds its
+    own bot with `bot_factory`, logs in and runs the usual command and event machinery.
+
+    ```py
+    def make_bot() -> Bot:
+        bot = Bot(api_url=...)
+
+        @bot.command()
+        def render(ctx: Ctx, *, text): ...
+
+        return bot
+
+    if __name__ == "__main__":
+        ShardedRunner(make_bot, workers=4).run(os.getenv("TOKEN"))
+    ```
+
+    Args:
+        bot_factory: Module level (picklable) function returning a configured bot.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        connect_timeout: Seconds to wait for every worker to log in and connect.
+        loop_options: Event loop options for every process, see [`rtlink.utils.run`][rtlink.utils.run].
+    """
+
+    def __init__(
+        self,
+        bot_factory: Callable[[], Bot],
+        workers: Optional[int] = None,
+        connect_timeout: float = 60,
+        loop_options: Optional[Dict[str, Any]] = None,
+    ):
+        self.bot_factory = bot_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.connect_timeout = connect_timeout
+        self.loop_options = loop_options or {}
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._all_connected = asyncio.Event()
+
+    async def _on_worker_connect(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        (index,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+        self._writers[index] = writer
+        if len(self._writers) == self.workers:
+            self._all_connected.set()
+
+    async def start(self, token: str):
+        """Non-blocking entry point. Starts the workers and forwards events until cancelled."""
+        setup_logging()
+        # Only used to learn the RTE url and which events to subscribe to, it never logs in
+        bot = self.bot_factory()
+        await bot._validate_and_set_api_info()
+        await bot._client.close()
+        bot._shutdown_executors()
+
+        ctx = multiprocessing.get_context("spawn")
+        with tempfile.TemporaryDirectory(prefix="rtlink-") as tmp:
+            path = os.path.join(tmp, "ingest.sock")
+            server = await asyncio.start_unix_server(self._on_worker_connect, path)
+            processes: List[multiprocessing.process.BaseProcess] = [
+                ctx.Process(
+                    target=_worker_main,
+                    args=(self.bot_factory, token, path, i, self.loop_options),
+                    name=f"rtlink-worker-{i}",
+                )
+                for i in range(self.workers)
+            ]
+            for process in processes:
+                process.start()
+            try:
+                await asyncio.wait_for(
+                    self._all_connected.wait(), timeout=self.connect_timeout
+                )
+                await self._forward(bot._rte_endpoint(), bot.ws_options)
+            finally:
+                for writer in self._writers.values():
+                    writer.close()
+                server.close()
+                await asyncio.to_thread(self._join, processes)
+
+    async def _forward(self, endpoint: str, options: WebsocketOptions):
+        async with connect(endpoint, **options.connect_kwargs()) as ws:
+            options.apply(ws)
+            logger.info("Forwarding RTE events to %d workers", self.workers)
+            while True:
+                try:
+                    raw = await ws.recv()
+                except asyncio.CancelledError:
+                    logger.info("Disconnecting from RTE websocket")
+                    return
+                data = raw.encode() if isinstance(raw, str) else raw
+                writer = self._writers[shard_for(json.loads(data), self.workers)]
+                writer.write(_HEADER.pack(len(data)))
+                writer.write(data)
+                # Applies backpressure when a worker falls behind instead of buffering forever
+                await writer.drain()
+
+    @staticmethod
+    def _join(processes: List[multiprocessing.process.BaseProcess]):
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+    def run(self, token: str):
+        """Blocking call to run the ingest process and its workers."""
+        try:
+            run(self.start(token), **self.loop_options)
+        except KeyboardInterrupt:
+            pass
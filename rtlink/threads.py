@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, MutableMapping, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .bot import Bot
+    from .types import Comment
+
+
+class _PostThread:
+    __slots__ = ("comments", "children")
+
+    def __init__(self):
+        # Oldest first by creation time, bounded by ThreadIndex.per_post
+        self.comments: OrderedDict[str, Comment] = OrderedDict()
+        # Parent ID -> IDs of its replies, oldest first
+        self.children: Dict[str, Dict[str, None]] = {}
+
+    def insert(self, order: MutableMapping[str, Any], comment: Comment, value: Any):
+        """Adds a new comment to `order` behind the comments created before it. Comments from
+        the RTE stream are the newest and simply go last, comments fetched from the API can land
+        anywhere."""
+        order[comment.id] = value
+        if comment.created_at is None:
+            return
+        newer = []
+        for id in reversed(order):
+            if id == comment.id:
+                continue
+            other = self.comments.get(id)
+            if other is None or (other.created_at or 0) <= comment.created_at:
+                break
+            newer.append(id)
+        for id in reversed(newer):
+            order[id] = order.pop(id)
+
+
+class ThreadIndex:
+    """Reply tree of recent comments, built from the RTE stream as comments arrive. Gives thread
+    context to handlers without an API call per event.
+
+    Posts are kept in least recently used order. Past `max_posts` the coldest post is dropped with
+    all its comments, and every post keeps at most its `per_post` newest comments, so memory is
+    bounded by `max_posts * per_post` comments. Lookups that miss the index fall back to the API
+    through [`Bot.fetch_comment`][rtlink.bot.Bot.fetch_comment].
+
+    ```py
+    bot = Bot(threads=ThreadIndex())
+
+    @bot.on_event("comment")
+    async def on_comment(comment: Comment):
+        chain = await bot.threads.ancestors(comment)
+        context = bot.threads.recent(comment.post_id, 10)
+    ```
+
+    Args:
+        max_posts: Number of posts to keep.
+        per_post: Number of comments to keep per post.
+    """
+
+    def __init__(self, max_posts: int = 1000, per_post: int = 200):
+        self.max_posts = max_posts
+        self.per_post = per_post
+        self._posts: OrderedDict[str, _PostThread] = OrderedDict()
+        self._by_id: Dict[str, Comment] = {}
+
+    def _set_bot(self, bot: Bot):
+        self.bot = bot
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, comment_id: str) -> bool:
+        return comment_id in self._by_id
+
+    def add(self, comment: Comment):
+        """Adds a comment, replacing an earlier version with the same ID. Comments are ordered
+        by creation time, not by when they were added."""
+        if (thread := self._posts.get(comment.post_id)) is None:
+            thread = self._posts[comment.post_id] = _PostThread()
+            if len(self._posts) > self.max_posts:
+                self._drop_post(self._posts.popitem(last=False)[1])
+        else:
+            self._posts.move_to_end(comment.post_id)
+        if comment.id in thread.comments:
+            thread.comments[comment.id] = comment
+        else:
+            thread.insert(thread.comments, comment, comment)
+            if comment.reply_to:
+                siblings = thread.children.setdefault(comment.reply_to, {})
+                thread.insert(siblings, comment, None)
+        self._by_id[comment.id] = comment
+        if len(thread.comments) > self.per_post:
+            self._drop_comment(thread, thread.comments.popitem(last=False)[1])
+
+    def _drop_post(self, thread: _PostThread):
+        for id in thread.comments:
+            self._by_id.pop(id, None)
+
+    def _drop_comment(self, thread: _PostThread, comment: Comment):
+        self._by_id.pop(comment.id, None)
+        if comment.reply_to and (siblings := thread.children.get(comment.reply_to)):
+            siblings.pop(comment.id, None)
+            if not siblings:
+                del thread.children[comment.reply_to]
+        # Its replies stay, they just can't walk further up than this without the API
+        thread.children.pop(comment.id, None)
+
+    def _touch(self, post_id: str) -> Optional[_PostThread]:
+        if thread := self._posts.get(post_id):
+            self._posts.move_to_end(post_id)
+        return thread
+
+    def get(self, comment_id: str) -> Optional[Comment]:
+        """The comment with this ID if it is in the index."""
+        if comment := self._by_id.get(comment_id):
+            self._touch(comment.post_id)
+        return comment
+
+    async def fetch(self, comment_id: str) -> Optional[Comment]:
+        """Like [`get`][rtlink.threads.ThreadIndex.get], asks the API on a miss and indexes the
+        result."""
+        if comment := self.get(comment_id):
+            return comment
+        if comment := await self.bot.fetch_comment(comment_id):
+            self.add(comment)
+        return comment
+
+    async def parent(self, comment: Comment) -> Optional[Comment]:
+        """The comment this one replies to, `None` for top level comments."""
+        if not comment.reply_to:
+            return None
+        return await self.fetch(comment.reply_to)
+
+    async def ancestors(self, comment: Comment, limit: int = 20) -> List[Comment]:
+        """The parent chain of a comment, nearest parent first, at most `limit` long."""
+        chain: List[Comment] = []
+        while len(chain) < limit and (parent := await self.parent(comment)):
+            chain.append(parent)
+            comment = parent
+        return chain
+
+    def replies(self, comment: Comment) -> List[Comment]:
+        """Indexed replies to a comment, oldest first."""
+        thread = self._touch(comment.post_id)
+        if thread is None or not (ids := thread.children.get(comment.id)):
+            return []
+        return [thread.comments[id] for id in ids]
+
+    def siblings(self, comment: Comment) -> List[Comment]:
+        """Other indexed replies to the same parent, oldest first. Top level comments have no
+        siblings."""
+        thread = self._touch(comment.post_id)
+        if thread is None or not comment.reply_to:
+            return []
+        ids = thread.children.get(comment.reply_to) or {}
+        return [thread.comments[id] for id in ids if id != comment.id]
+
+    def recent(self, post_id: str, n: int = 20) -> List[Comment]:
+        """The `n` newest indexed comments of a post, oldest first."""
+        thread = self._touch(post_id)
+        if thread is None or n <= 0:
+            return []
+        comments = thread.comments
+        if n >= len(comments):
+            return list(comments.values())
+        it = reversed(comments.values())
+        newest = [next(it) for _ in range(n)]
+        newest.reverse()
+        return newest
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import re
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _Automaton:
+    """Aho-Corasick automaton over the registered keywords. Finds every occurrence of every
+    keyword in one pass over the text, however many keywords there are."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (keyword length, trigger index) for every keyword ending at a node
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+    def add(self, keyword: str, index: int):
+        node = 0
+        for char in keyword:
+            if (next_node := self._goto[node].get(char)) is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append((len(keyword), index))
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                # Keywords that are suffixes of this one end here too
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text: str):
+        """Yields `(start, end, trigger index)` for every keyword occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, index in out[node]:
+                yield end - length, end, index
+
+
+def _lower(text: str) -> str:
+    # Keeps positions aligned with the original text, a few characters lowercase to two
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+_SCOPED_FLAGS = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+)
+
+
+def _scoped(pattern: Pattern) -> str:
+    # Flags of each regex only apply to its own branch of the merged alternation
+    flags = "".join(f for flag, f in _SCOPED_FLAGS if pattern.flags & flag)
+    return "(?{}:{})".format(flags, pattern.pattern)
+
+
+def _mergeable(pattern: Pattern) -> bool:
+    # Groups are renumbered in the merged alternation, a backreference in a later branch would
+    # silently point at another regex's group. Regexes with groups are searched on their own.
+    return not pattern.groups
+
+
+def _is_word_char(text: str, i: int) -> bool:
+    return 0 <= i < len(text) and (text[i].isalnum() or text[i] == "_")
+
+
+class Trigger:
+    def __init__(
+        self,
+        fn: Callable,
+        keywords: Sequence[str],
+        patterns: Sequence[Pattern],
+        case_sensitive: bool,
+        word: bool,
+    ):
+        self.fn = fn
+        self.keywords = keywords
+        self.patterns = patterns
+        self.case_sensitive = case_sensitive
+        self.word = word
+
+
+class TriggerSet:
+    """All triggers of a bot, compiled into one matcher. Literal keywords go into an Aho-Corasick
+    automaton and regexes into a single alternation, so a comment is scanned once no matter how
+    many triggers there are. Regexes with capturing groups can't be merged and are searched one
+    by one. Recompiled lazily after triggers change."""
+
+    def __init__(self):
+        self.triggers: List[Trigger] = []
+        self._compiled = False
+        self._automata: Dict[bool, _Automaton] = {}
+        self._regex_filter: Optional[Pattern] = None
+        self._regex_triggers: List[int] = []
+        self._standalone: Set[Pattern] = set()
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    def add(self, trigger: Trigger):
+        self.triggers.append(trigger)
+        self._compiled = False
+
+    def remove(self, fn: Callable):
+        self.triggers = [t for t in self.triggers if t.fn is not fn]
+        self._compiled = False
+
+    def _compile(self):
+        self._automata = {}
+        self._regex_triggers = []
+        self._standalone = set()
+        alternatives = []
+        for i, trigger in enumerate(self.triggers):
+            if trigger.keywords:
+                if (automaton := self._automata.get(trigger.case_sensitive)) is None:
+                    automaton = self._automata[trigger.case_sensitive] = _Automaton()
+                for keyword in trigger.keywords:
+                    automaton.add(
+                        keyword if trigger.case_sensitive else _lower(keyword), i
+                    )
+            if trigger.patterns:
+                self._regex_triggers.append(i)
+                for pattern in trigger.patterns:
+                    if _mergeable(pattern):
+                        alternatives.append(_scoped(pattern))
+                    else:
+                        self._standalone.add(pattern)
+        for automaton in self._automata.values():
+            automaton.build()
+        self._regex_filter = None
+        if alternatives:
+            try:
+                self._regex_filter = re.compile("|".join(alternatives))
+            except re.error as e:
+                # e.g. global inline flags, which don't survive merging. Every regex is then tried
+                # on its own.
+                logger.warn(
+                    "Can't merge trigger regexes, matching them one by one: {}".format(
+                        e
+                    )
+                )
+        self._compiled = True
+
+    def match(self, text: str) -> List[Tuple[Trigger, Any]]:
+        """Every trigger that matches `text`, in registration order, each with its first match:
+        the keyword for literal triggers, the `re.Match` for regex triggers."""
+        if not self._compiled:
+            self._compile()
+        found: Dict[int, Any] = {}
+        for case_sensitive, automaton in self._automata.items():
+            haystack = text if case_sensitive else _lower(text)
+            for start, end, index in automaton.scan(haystack):
+                if index in found:
+                    continue
+                trigger = self.triggers[index]
+                if trigger.word and (
+                    _is_word_char(text, start - 1) or _is_word_char(text, end)
+                ):
+                    continue
+                keyword = haystack[start:end]
+                # Report the keyword as registered, not as written in the comment
+                found[index] = next(
+                    (
+                        k
+                        for k in trigger.keywords
+                        if (k if case_sensitive else _lower(k)) == keyword
+                    ),
+                    keyword,
+                )
+        if self._regex_triggers:
+            # Most comments match nothing and stop at the merged scan. Only on a hit is each
+            # merged regex run, so that triggers matching the same spot all fire.
+            merged_hit = self._regex_filter is None or bool(
+                self._regex_filter.search(text)
+            )
+            for index in self._regex_triggers:
+                if index in found:
+                    continue
+                for pattern in self.triggers[index].patterns:
+                    if not merged_hit and pattern not in self._standalone:
+                        continue
+                    if m := pattern.search(text):
+                        found[index] = m
+                        break
+        return [(self.triggers[i], found[i]) for i in sorted(found)]
+
+
+def make_trigger(
+    fn: Callable,
+    keywords: Sequence[str],
+    regex: Union[str, Pattern, Sequence[Union[str, Pattern]]],
+    case_sensitive: bool,
+    word: bool,
+) -> Trigger:
+    if isinstance(regex, (str, re.Pattern)):
+        regex = [regex]
+    flags = 0 if case_sensitive else re.IGNORECASE
+    patterns = [r if isinstance(r, re.Pattern) else re.compile(r, flags) for r in regex]
+    if not keywords and not patterns:
+        raise ValueError("A trigger needs at least one keyword or regex")
+    return Trigger(fn, [k for k in keywords if k], patterns, case_sensitive, word)
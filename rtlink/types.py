@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Any, Callable, Dict, Optional, List
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -62,6 +62,53 @@ class Forum:
     banned_members: List[str]
     locked: bool
 
+    @classmethod
+    def _populate(cls, res):
+        return cls(
+            id=res.get("id"),
+            name=res.get("name"),
+            display_name=res.get("displayName"),
+            description=res.get("description"),
+            icon=File(res["icon"]["loc"]) if res.get("icon") else None,
+            banner=File(res["banner"]["loc"]) if res.get("banner") else None,
+            post_count=res.get("postCount"),
+            created_at=datetime.fromtimestamp(res["createdAt"]),
+            modified_at=datetime.fromtimestamp(res["modifiedAt"]),
+            owner_id=res.get("ownerId"),
+            moderators=res.get("moderators"),
+            banned_members=res.get("bannedMembers"),
+            locked=res.get("locked"),
+        )
+
+
+@dataclass
+class Post:
+    id: str
+    title: str
+    content: Optional[str]
+    poster_id: str
+    forum_id: str
+    tags: List[str]
+    created_at: int
+    modified_at: int
+    upvotes: int
+    downvotes: int
+
+    @classmethod
+    def _populate(cls, res):
+        return cls(
+            id=res.get("id"),
+            title=res.get("title"),
+            content=res.get("content"),
+            poster_id=res.get("posterId"),
+            forum_id=res.get("forumId"),
+            tags=res.get("tags"),
+            created_at=res.get("createdAt"),
+            modified_at=res.get("modifiedAt"),
+            upvotes=res.get("upvotes"),
+            downvotes=res.get("downvotes"),
+        )
+
 
 @dataclass
 class Comment:
@@ -88,24 +135,87 @@ class Comment:
     def _client(self, v):
         self.__client = v
 
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for fields a slim query left out, they are filled in on first access
+        loaders = self.__dict__.get("_lazy")
+        if loaders and name in loaders:
+            value = loaders.pop(name)(self)
+            setattr(self, name, value)
+            return value
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+        )
+
     @classmethod
-    def _populate(cls, res):
-        return cls(
-            id=res.get("id"),
-            content=res.get("content"),
-            commenter_id=res.get("commenterId"),
-            reply_to=res.get("replyTo"),
-            post_id=res.get("postId"),
-            forum_id=res.get("forumId"),
-            commenter=User._populate(res.get("commenter")),
-            created_at=res.get("createdAt"),
-            modified_at=res.get("modifiedAt"),
-            reply_count=res.get("replyCount"),
-            upvotes=res.get("upvotes"),
-            downvotes=res.get("downvotes"),
-            upvoted_by=res.get("upvotedBy"),
-            downvoted_by=res.get("downvotedBy"),
+    def _populate(cls, res, lazy: Optional[Dict[str, Callable]] = None):
+        """Builds a comment from an API response. Fields missing from the response are left unset
+        and resolved through `lazy` when first accessed."""
+        if lazy is None:
+            return cls(
+                id=res.get("id"),
+                content=res.get("content"),
+                commenter_id=res.get("commenterId"),
+                reply_to=res.get("replyTo"),
+                post_id=res.get("postId"),
+                forum_id=res.get("forumId"),
+                commenter=User._populate(res.get("commenter")),
+                created_at=res.get("createdAt"),
+                modified_at=res.get("modifiedAt"),
+                reply_count=res.get("replyCount"),
+                upvotes=res.get("upvotes"),
+                downvotes=res.get("downvotes"),
+                upvoted_by=res.get("upvotedBy"),
+                downvoted_by=res.get("downvotedBy"),
+            )
+        comment = cls.__new__(cls)
+        for field, key in _COMMENT_KEYS.items():
+            if key in res:
+                value = res[key]
+                if field == "commenter":
+                    value = User._populate(value)
+                setattr(comment, field, value)
+        comment._lazy = dict(lazy)
+        return comment
+
+    async def reply(self, content: str, fields: str = "full") -> "Comment":
+        """Replies to this comment.
+
+        Args:
+            content: Content of the reply.
+            fields: Field profile of the returned comment, `"minimal"`, `"standard"` or `"full"`.
+                Fields left out are derived on first access.
+        """
+        return await self._client.create_comment(
+            self.post_id, content, self.id, fields=fields
         )
 
-    async def reply(self, content: str) -> "Comment":
-        return await self._client.create_comment(self.post_id, content, self.id)
+
+_COMMENT_KEYS = {
+    "id": "id",
+    "content": "content",
+    "commenter_id": "commenterId",
+    "reply_to": "replyTo",
+    "post_id": "postId",
+    "forum_id": "forumId",
+    "commenter": "commenter",
+    "created_at": "createdAt",
+    "modified_at": "modifiedAt",
+    "reply_count": "replyCount",
+    "upvotes": "upvotes",
+    "downvotes": "downvotes",
+    "upvoted_by": "upvotedBy",
+    "downvoted_by": "downvotedBy",
+}
+
+# A comment that was just created by the bot needs no round trip for what a slim profile
+# leaves out: it was written by the bot user and has no votes, replies or edits yet.
+NEW_COMMENT_LOADERS: Dict[str, Callable[[Comment], Any]] = {
+    "commenter_id": lambda c: c._client.user.id,
+    "commenter": lambda c: c._client.user,
+    "modified_at": lambda c: c.created_at,
+    "reply_count": lambda c: 0,
+    "upvotes": lambda c: 0,
+    "downvotes": lambda c: 0,
+    "upvoted_by": lambda c: [],
+    "downvoted_by": lambda c: [],
+}
@@ -1,7 +1,18 @@
+import asyncio
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
 import sys
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_listener: Optional[QueueListener] = None
 
 
 class _ColourFormatter(logging.Formatter):
@@ -70,10 +81,72 @@ def stream_supports_colour(stream: Any) -> bool:
     return is_a_tty and ("ANSICON" in os.environ or "WT_SESSION" in os.environ)
 
 
-def setup_logging():
-    level = logging.INFO
-    handler = logging.StreamHandler()
-    if stream_supports_colour(handler.stream):
+class _JsonFormatter(logging.Formatter):
+    # Attributes every LogRecord has, anything else was passed through `extra=`
+    RESERVED = frozenset(
+        logging.LogRecord("", 0, "", 0, "", None, None).__dict__.keys()
+    ) | {"message", "asctime"}
+
+    def format(self, record):
+        data = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.RESERVED:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # The default implementation formats the whole record (exceptions included) on the
+        # calling thread. Only merge the arguments here so that mutable objects passed as
+        # args are captured, the actual formatting is left to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _stop_listener():
+    # Flushes whatever is still queued at interpreter exit
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    *,
+    json_format: bool = False,
+    stream: Any = None,
+) -> QueueListener:
+    """Sets up the `rtlink` logger. Only the first call has any effect, later calls return the
+    already running listener.
+
+    Records are put on a queue by the calling thread and formatted/written by a background
+    listener thread, so slow consoles never block the event loop.
+
+    Args:
+        level: Level of the `rtlink` logger.
+        json_format: Emit one JSON object per line instead of human readable output.
+        stream: Stream to write to. Defaults to `sys.stderr`.
+
+    Returns:
+        The queue listener that owns the actual handler.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    handler = logging.StreamHandler(stream)
+    if json_format:
+        formatter = _JsonFormatter()
+    elif stream_supports_colour(handler.stream):
         formatter = _ColourFormatter()
     else:
         dt_fmt = "%Y-%m-%d %H:%M:%S"
@@ -81,7 +154,76 @@ def setup_logging():
             "[{asctime}] [{levelname:<8}] {name}: {message}", dt_fmt, style="{"
         )
     handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+
     logger = logging.getLogger(__name__.partition(".")[0])
     logger.setLevel(level)
-    logger.addHandler(handler)
+    logger.addHandler(_QueueHandler(log_queue))
     logger.propagate = False
+    return _listener
+
+
+def get_loop_factory(
+    use_uvloop: bool = False,
+) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    """Returns uvloop's loop factory when asked for and installed, `None` (the default asyncio
+    loop) otherwise."""
+    if not use_uvloop:
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        logging.getLogger(__name__).warning(
+            "uvloop is not installed, falling back to the asyncio event loop"
+        )
+        return None
+    return uvloop.new_event_loop
+
+
+def run(
+    main: Coroutine[Any, Any, T],
+    *,
+    use_uvloop: bool = False,
+    loop_factory: Optional[Callable[[], asyncio.AbstractEventLoop]] = None,
+    debug: Optional[bool] = None,
+    eager_tasks: bool = True,
+    default_executor_workers: Optional[int] = None,
+    slow_callback_duration: Optional[float] = None,
+) -> T:
+    """Runs a coroutine on a new, configured event loop. Like `asyncio.run` but with every
+    loop level knob rtlink cares about in one place.
+
+    Args:
+        main: The coroutine to run.
+        use_uvloop: Use uvloop when installed. Ignored when `loop_factory` is given.
+        loop_factory: Callable returning a new event loop.
+        debug: asyncio debug mode. `None` keeps the `PYTHONASYNCIODEBUG` default.
+        eager_tasks: Use `asyncio.eager_task_factory` (Python 3.12+), tasks that can finish
+            without suspending never hit the scheduler.
+        default_executor_workers: Size of the loop's default executor, used for DNS resolution
+            among others. Bots run their handlers in their own pools.
+        slow_callback_duration: Seconds after which debug mode logs a callback as slow.
+
+    Returns:
+        Whatever `main` returns.
+    """
+    with asyncio.Runner(
+        debug=debug, loop_factory=loop_factory or get_loop_factory(use_uvloop)
+    ) as runner:
+        loop = runner.get_loop()
+        if eager_tasks and hasattr(asyncio, "eager_task_factory"):
+            loop.set_task_factory(asyncio.eager_task_factory)  # type: ignore
+        if default_executor_workers:
+            loop.set_default_executor(
+                ThreadPoolExecutor(
+                    max_workers=default_executor_workers,
+                    thread_name_prefix="rtlink-default",
+                )
+            )
+        if slow_callback_duration is not None:
+            loop.slow_callback_duration = slow_callback_duration
+        return runner.run(main)
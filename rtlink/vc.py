@@ -2,7 +2,7 @@ from __future__ import annotations
 import json
 import logging
 import sys
-from typing import Any, Dict, Optional, TYPE_CHECKING
+from typing import Any, Dict, Optional, Union, TYPE_CHECKING
 import asyncio
 from asyncio.futures import Future
 
@@ -10,29 +10,54 @@ from pymediasoup import Device
 from pymediasoup import AiortcHandler
 from pymediasoup.transport import Transport
 
-from aiortc.contrib.media import MediaBlackhole, MediaStreamTrack
+from aiortc.contrib.media import MediaStreamTrack
 
 from websockets.client import WebSocketClientProtocol, connect as ws_connect
 
+from .options import WebsocketOptions
+from .recording import Recorder
+from .vcstats import StatsCollector, StreamStats
+
 if TYPE_CHECKING:
     from .bot import Bot
+    from .mixer import Mixer
 
 _log = logging.getLogger(__name__)
 
 
 class VcClient:
+    """Connection to a voice chat room.
+
+    Args:
+        bot: The bot that joins.
+        url: URL of the VC signalling server, usually `bot.vc_url`.
+        vc_name: Room to join.
+        recorder: Records the other participants. Without it their audio isn't received.
+        ws_options: Signalling socket settings, defaults to the bot's.
+        stats: Samples media quality of the room's streams, see
+            [`StatsCollector`][rtlink.vcstats.StatsCollector]. `True` uses the defaults, `False`
+            turns it off.
+    """
+
     def __init__(
         self,
         bot: Bot,
         url: str,
         vc_name: str,
         loop=None,
-        recorder=MediaBlackhole(),
+        recorder: Optional[Recorder] = None,
+        ws_options: Optional[WebsocketOptions] = None,
+        stats: Union[StatsCollector, bool] = True,
     ):
         self._loop = loop
+        self.ws_options = ws_options or bot.ws_options
         self._bot = bot
         self.vc_name = vc_name
+        # Without a recorder remote producers aren't consumed at all, an unread track would
+        # queue its frames forever
         self.recorder = recorder
+        if recorder is not None:
+            recorder._set_bot(bot)
 
         self._url = url
         self._waiting_for_response: Dict[str, Future] = {}
@@ -42,8 +67,16 @@ class VcClient:
         self._send_transport: Optional[Transport] = None
         self._recv_transport: Optional[Transport] = None
 
+        self.stats_collector: Optional[StatsCollector] = (
+            StatsCollector() if stats is True else stats or None
+        )
+        if self.stats_collector is not None:
+            self.stats_collector._set_client(self)
         self._producers = []
-        self._consumers = []
+        self._mixer: Optional[Mixer] = None
+        self._consumers: Dict[str, Any] = {}
+        # Responses are matched by action, so only one Consume can be in flight
+        self._consume_lock = asyncio.Lock()
         self._tasks = []
         self._connected = False
         self._events: Dict[str, Future] = {}
@@ -55,7 +88,7 @@ class VcClient:
             if self._ws:
                 try:
                     msg = json.loads(await self._ws.recv())
-                    _log.debug(f"S2C {msg}")
+                    _log.debug("S2C %s", msg)
                     callback = self._waiting_for_response.get(msg["action"])
                     if callback:
                         del self._waiting_for_response[msg["action"]]
@@ -64,6 +97,13 @@ class VcClient:
                         if msg["action"] == "Init":
                             t = asyncio.create_task(self._init(msg))
                             self._tasks.append(t)
+                        elif msg["action"] == "NewProducer":
+                            self._spawn_consume(msg)
+                        elif msg["action"] == "ProducerClosed":
+                            t = asyncio.create_task(
+                                self._close_consumer(msg["producerId"])
+                            )
+                            self._tasks.append(t)
                         else:
                             _log.debug("^^ Action: IGNORED")
                 except asyncio.CancelledError:
@@ -72,7 +112,7 @@ class VcClient:
 
     async def _send(self, msg):
         if self._ws:
-            _log.debug(f"C2S {msg}")
+            _log.debug("C2S %s", msg)
             await self._ws.send(json.dumps(msg))
 
     async def _wait_for(self, event: str, timeout: Optional[float], **kwargs: Any):
@@ -142,11 +182,58 @@ class VcClient:
             await self._wait_for("ConnectedConsumerTransport", timeout=15)
 
         self._connected = True
+        for producer in msg.get("producers", []):
+            self._spawn_consume(producer)
+
+    def _spawn_consume(self, producer: Dict[str, Any]):
+        if self.recorder is None or producer.get("kind", "audio") != "audio":
+            return
+        t = asyncio.create_task(self._consume(producer))
+        self._tasks.append(t)
+        t.add_done_callback(self._tasks.remove)
+
+    async def _consume(self, producer: Dict[str, Any]):
+        producer_id = producer["producerId"]
+        speaker = producer.get("user") or producer_id
+        try:
+            async with self._consume_lock:
+                await self._send(
+                    {
+                        "action": "Consume",
+                        "producerId": producer_id,
+                        "rtpCapabilities": self._device.rtpCapabilities.dict(),  # type: ignore
+                    }
+                )
+                ans = await self._wait_for("Consumed", timeout=15)
+            consumer = await self._recv_transport.consume(  # type: ignore
+                id=ans["id"],
+                producerId=producer_id,
+                kind=ans["kind"],
+                rtpParameters=ans["rtpParameters"],
+                appData={"speaker": speaker},
+            )
+        except Exception as e:
+            _log.warn("Can't consume audio of {}: {}".format(speaker, e))
+            return
+        self._consumers[producer_id] = consumer
+        self.recorder.add(speaker, consumer.track)  # type: ignore
+        _log.debug("Recording %s", speaker)
+
+    async def _close_consumer(self, producer_id: str):
+        if consumer := self._consumers.pop(producer_id, None):
+            await self.recorder.remove(consumer.appData["speaker"])  # type: ignore
+            await consumer.close()
 
     async def close(self):
         for task in self._tasks:
             task.cancel()
-        for consumer in self._consumers:
+        if self.stats_collector is not None:
+            self.stats_collector.stop()
+        if self.recorder is not None:
+            await self.recorder.close()
+        if self._mixer is not None:
+            self._mixer.stop()
+        for consumer in self._consumers.values():
             await consumer.close()
         for producer in self._producers:
             await producer.close()
@@ -155,13 +242,17 @@ class VcClient:
         if self._recv_transport:
             await self._recv_transport.close()
         self.closed = True
+        self._bot._vc_clients.discard(self)
         _log.debug("Disconnected from VC")
 
     async def connect(self):
         self._ws = await ws_connect(
-            self._url + "?user={}".format(self._bot.user.username)
+            self._url + "?user={}".format(self._bot.user.username),
+            **self.ws_options.connect_kwargs(),
         )
+        self.ws_options.apply(self._ws)
         _log.debug('Connected to VC "{}"'.format(self.vc_name))
+        self._bot._vc_clients.add(self)
 
         if not self._loop:
             if sys.version_info.major == 3 and sys.version_info.minor == 6:
@@ -176,6 +267,13 @@ class VcClient:
             await asyncio.sleep(0.02)
         await self._tasks[1]
         self._tasks.pop(1)
+        if self.stats_collector is not None:
+            self.stats_collector.start()
+
+    @property
+    def stats(self) -> Dict[str, StreamStats]:
+        """Latest media quality sample per producer and consumer ID. Empty when stats are off."""
+        return self.stats_collector.latest if self.stats_collector else {}
 
     async def play(self, track: MediaStreamTrack):
         p = await self._send_transport.produce(track=track, stopTracks=False)  # type: ignore
@@ -189,6 +287,21 @@ class VcClient:
 
         return p
 
+    async def mixer(self, buffer: int = 10) -> Mixer:
+        """The room's [`Mixer`][rtlink.mixer.Mixer], published on first use. Add sources to it
+        instead of calling [`play`][rtlink.vc.VcClient.play] for each, they then share one
+        producer and one encoder. Needs NumPy.
+
+        Args:
+            buffer: Frames read ahead per source, only used when the mixer is created.
+        """
+        if self._mixer is None:
+            from .mixer import Mixer
+
+            self._mixer = Mixer(buffer)
+            await self.play(self._mixer)
+        return self._mixer
+
     async def wait_for_track_end(self, track_id: str, timeout: Optional[float] = None):
         self._events[f"{track_id}-ended"] = self._loop.create_future()  # type: ignore
         await asyncio.wait_for(self._events[f"{track_id}-ended"], timeout=timeout)
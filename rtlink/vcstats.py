@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .vc import VcClient
+
+logger = logging.getLogger(__name__)
+
+# Opus, the only codec VC uses
+_DEFAULT_CLOCK_RATE = 48000
+
+
+@dataclass
+class StreamStats:
+    """Quality of one producer or consumer over the last sampling interval.
+
+    Attributes:
+        id: Producer or consumer ID.
+        direction: `"send"` for producers, `"recv"` for consumers.
+        label: Speaker of a consumer, track ID of a producer.
+        bitrate: Bits per second. `None` for consumers, aiortc only counts received bytes per
+            transport.
+        packets: Packets sent or received.
+        packets_lost: Packets lost in total, as reported by the receiving end.
+        loss: Share of packets lost, 0 to 1.
+        jitter: Interarrival jitter in seconds.
+        rtt: Round trip time in seconds, producers only.
+        encode_time: Mean seconds spent encoding a frame, producers only.
+    """
+
+    id: str
+    direction: str
+    label: str
+    bitrate: Optional[float] = None
+    packets: int = 0
+    packets_lost: int = 0
+    loss: Optional[float] = None
+    jitter: Optional[float] = None
+    rtt: Optional[float] = None
+    encode_time: Optional[float] = None
+
+
+class _EncodeTimer:
+    __slots__ = ("encoder", "total", "count")
+
+    def __init__(self, encoder: Any):
+        self.encoder = encoder
+        self.total = 0.0
+        self.count = 0
+        encode = encoder.encode
+
+        def timed(*args, **kwargs):
+            # Runs in the executor thread aiortc encodes in, the GIL keeps the sums consistent
+            # enough for statistics
+            start = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.count += 1
+
+        encoder.encode = timed
+
+    def take(self) -> Optional[float]:
+        total, count = self.total, self.count
+        self.total, self.count = 0.0, 0
+        return total / count if count else None
+
+
+class _State:
+    __slots__ = ("at", "bytes", "packets", "lost", "timer")
+
+    def __init__(self):
+        self.at = 0.0
+        self.bytes = 0
+        self.packets = 0
+        self.lost = 0
+        self.timer: Optional[_EncodeTimer] = None
+
+
+def _clock_rate(rtp_parameters: Any) -> int:
+    try:
+        return rtp_parameters.codecs[0].clockRate
+    except (AttributeError, IndexError):
+        return _DEFAULT_CLOCK_RATE
+
+
+def _of_type(report: Dict[str, Any], type: str) -> Optional[Any]:
+    return next((s for s in report.values() if s.type == type), None)
+
+
+class StatsCollector:
+    """Samples the RTP statistics of every producer and consumer of a
+    [`VcClient`][rtlink.vc.VcClient] every `interval` seconds. Reads counters aiortc keeps
+    anyway, so it can stay on in production.
+
+    The latest sample per stream is in `latest`, also exposed as `VcClient.stats`. Totals
+    per room go to `bot.metrics` under `vc.<room>.send.*` (`bitrate`, `loss`, `jitter`, `rtt`,
+    `encode_time`) and `vc.<room>.recv.*` (`bitrate`, `loss`, `jitter`). Bitrates are summed,
+    the rest is the worst stream's value.
+
+    Choppy audio with a high `encode_time` points at CPU, with loss or jitter at the network.
+
+    Args:
+        interval: Seconds between samples.
+    """
+
+    def __init__(self, interval: float = 5):
+        self.interval = interval
+        self.latest: Dict[str, StreamStats] = {}
+        self._states: Dict[str, _State] = {}
+        self._recv_bytes: Optional[_State] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _set_client(self, vc: VcClient):
+        self.vc = vc
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.debug("Collecting VC stats failed: %s", e)
+
+    async def collect(self) -> Dict[str, StreamStats]:
+        """Takes a sample now. Rates cover the time since the previous sample."""
+        now = time.monotonic()
+        latest: Dict[str, StreamStats] = {}
+        recv_transport_bytes = None
+        for producer in self.vc._producers:
+            if producer.closed or producer.rtpSender is None:
+                continue
+            report = await producer.rtpSender.getStats()
+            latest[producer.id] = self._producer_stats(producer, report, now)
+        for consumer in self.vc._consumers.values():
+            if consumer.closed or consumer.rtpReceiver is None:
+                continue
+            report = await consumer.rtpReceiver.getStats()
+            latest[consumer.id] = self._consumer_stats(consumer, report, now)
+            if transport := _of_type(report, "transport"):
+                recv_transport_bytes = transport.bytesReceived
+        for id in self._states.keys() - latest.keys():
+            del self._states[id]
+        self.latest = latest
+        self._publish(list(latest.values()), recv_transport_bytes, now)
+        return latest
+
+    def _state(self, id: str) -> _State:
+        if (state := self._states.get(id)) is None:
+            state = self._states[id] = _State()
+        return state
+
+    def _producer_stats(self, producer: Any, report: Dict[str, Any], now: float):
+        state = self._state(producer.id)
+        stats = StreamStats(producer.id, "send", producer.track.id)
+        encoder = getattr(producer.rtpSender, "_RTCRtpSender__encoder", None)
+        if encoder is not None and (
+            state.timer is None or state.timer.encoder is not encoder
+        ):
+            # aiortc doesn't report encode time, the encoder is timed instead. It exists once
+            # the first frame was sent.
+            state.timer = _EncodeTimer(encoder)
+        elif state.timer is not None:
+            stats.encode_time = state.timer.take()
+        if outbound := _of_type(report, "outbound-rtp"):
+            if state.at:
+                stats.bitrate = (
+                    (outbound.bytesSent - state.bytes) * 8 / (now - state.at)
+                )
+            stats.packets = outbound.packetsSent
+            state.bytes = outbound.bytesSent
+        if remote := _of_type(report, "remote-inbound-rtp"):
+            # From the receiver report of the server: fraction lost is 8 bit fixed point and
+            # jitter is in RTP timestamp units
+            stats.packets_lost = remote.packetsLost
+            stats.loss = remote.fractionLost / 256
+            stats.jitter = remote.jitter / _clock_rate(producer.rtpParameters)
+            stats.rtt = remote.roundTripTime
+        state.at = now
+        return stats
+
+    def _consumer_stats(self, consumer: Any, report: Dict[str, Any], now: float):
+        state = self._state(consumer.id)
+        stats = StreamStats(consumer.id, "recv", consumer.appData.get("speaker", ""))
+        if inbound := _of_type(report, "inbound-rtp"):
+            received = inbound.packetsReceived - state.packets
+            lost = inbound.packetsLost - state.lost
+            if state.at and received + lost > 0:
+                stats.loss = max(lost, 0) / (received + lost)
+            stats.packets = inbound.packetsReceived
+            stats.packets_lost = inbound.packetsLost
+            stats.jitter = inbound.jitter / _clock_rate(consumer.rtpParameters)
+            state.packets, state.lost = inbound.packetsReceived, inbound.packetsLost
+        state.at = now
+        return stats
+
+    def _publish(
+        self, streams: List[StreamStats], recv_bytes: Optional[int], now: float
+    ):
+        metrics = self.vc._bot.metrics
+        prefix = "vc.{}.".format(self.vc.vc_name)
+        for direction, fields in (
+            ("send", ("loss", "jitter", "rtt", "encode_time")),
+            ("recv", ("loss", "jitter")),
+        ):
+            selected = [s for s in streams if s.direction == direction]
+            for field in fields:
+                values = [v for s in selected if (v := getattr(s, field)) is not None]
+                if values:
+                    metrics.set(prefix + direction + "." + field, max(values))
+        sent = [s.bitrate for s in streams if s.bitrate is not None]
+        if sent:
+            metrics.set(prefix + "send.bitrate", sum(sent))
+        if recv_bytes is not None:
+            # Per transport only, see StreamStats.bitrate
+            if self._recv_bytes is None:
+                self._recv_bytes = _State()
+            elif self._recv_bytes.at:
+                rate = (recv_bytes - self._recv_bytes.bytes) * 8
+                metrics.set(prefix + "recv.bitrate", rate / (now - self._recv_bytes.at))
+            self._recv_bytes.bytes, self._recv_bytes.at = recv_bytes, now
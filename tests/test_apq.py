@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+
+from gql import gql
+from graphql import ExecutionResult, print_ast
+
+from rtlink.apq import PersistedQueryTransport
+
+QUERY = gql("query getForum($id: String) { getForum(id: $id) { id name } }")
+
+
+class FakeServer(PersistedQueryTransport):
+    """Answers like an APQ server without the network: hashes it hasn't seen the full text
+    for are a `PersistedQueryNotFound`."""
+
+    def __init__(self, supported: bool = True, **kwargs):
+        super().__init__("http://localhost/graphql", **kwargs)
+        self.supported = supported
+        self.known = set()
+        self.requests = []
+
+    async def _request(self, payload, use_get, extra_args):
+        self.requests.append((dict(payload), use_get))
+        persisted = payload.get("extensions", {}).get("persistedQuery")
+        if persisted and not self.supported:
+            return ExecutionResult(errors=[{"message": "PersistedQueryNotSupported"}])
+        if persisted and "query" not in payload:
+            if persisted["sha256Hash"] not in self.known:
+                return ExecutionResult(errors=[{"message": "PersistedQueryNotFound"}])
+        elif persisted:
+            assert (
+                hashlib.sha256(payload["query"].encode()).hexdigest()
+                == persisted["sha256Hash"]
+            )
+            self.known.add(persisted["sha256Hash"])
+        return ExecutionResult(data={"getForum": {"id": "1", "name": "general"}})
+
+
+def test_miss_retries_with_full_query():
+    transport = FakeServer()
+    result = asyncio.run(transport.execute(QUERY, {"id": "1"}))
+
+    assert result.data == {"getForum": {"id": "1", "name": "general"}}
+    (first, _), (retry, _) = transport.requests
+    assert "query" not in first
+    assert retry["query"] == print_ast(QUERY)
+    assert retry["extensions"] == first["extensions"]
+    assert retry["variables"] == {"id": "1"}
+
+
+def test_registered_hash_is_sent_alone():
+    transport = FakeServer()
+    asyncio.run(transport.execute(QUERY, {"id": "1"}))
+    transport.requests.clear()
+
+    asyncio.run(transport.execute(QUERY, {"id": "2"}))
+
+    ((payload, _),) = transport.requests
+    assert "query" not in payload
+
+
+def test_unsupported_server_falls_back_to_plain_requests():
+    transport = FakeServer(supported=False)
+    result = asyncio.run(transport.execute(QUERY, {"id": "1"}))
+
+    assert result.data is not None
+    assert not transport.enabled
+    retry, _ = transport.requests[-1]
+    assert "extensions" not in retry
+    assert retry["query"] == print_ast(QUERY)
+
+
+def test_get_operations_use_get():
+    transport = FakeServer(get_operations={"getForum"})
+    asyncio.run(transport.execute(QUERY, {"id": "1"}))
+
+    assert all(use_get for _, use_get in transport.requests)
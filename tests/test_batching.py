@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from rtlink.http import HTTPClient
+
+
+class StalledClient(HTTPClient):
+    """Never answers, like a server that hangs."""
+
+    def __init__(self):
+        super().__init__("http://localhost/api", batch_window=0.01)
+
+    async def _execute(self, document, variable_values=None):
+        await asyncio.Event().wait()
+
+
+@pytest.mark.parametrize("started", [False, True])
+def test_cancelled_batch_cancels_its_replies(started):
+    async def run():
+        client = StalledClient()
+        queue = client._reply_queue
+        replies = [
+            asyncio.ensure_future(queue.submit("p1", text)) for text in ("a", "b")
+        ]
+        while not queue._sending:
+            await asyncio.sleep(0.01)
+        if started:
+            await asyncio.sleep(0.05)
+        for task in queue._sending:
+            task.cancel()
+        done, _ = await asyncio.wait(replies, timeout=1)
+        return done
+
+    done = asyncio.run(run())
+    assert len(done) == 2
+    for reply in done:
+        with pytest.raises(asyncio.CancelledError):
+            reply.result()
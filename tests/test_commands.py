@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+import types
+
+from rtlink import Bot
+
+bot = Bot()
+
+
+@bot.command(executor="process")
+def heavy(ctx, *, text):
+    # Runs in a worker process, ctx can't be pickled and is None
+    assert ctx is None
+    return text.upper()
+
+
+class FakeComment:
+    def __init__(self, content: str):
+        self.id = "c1"
+        self.content = content
+        self.replies = []
+        self.fields = []
+
+    async def reply(self, content: str, fields: str = "full"):
+        self.replies.append(content)
+        self.fields.append(fields)
+
+
+def test_decorator_returns_function():
+    assert callable(heavy)
+    assert bot.command_manager.commands["heavy"].fn is heavy
+
+
+def test_process_command_end_to_end():
+    async def run():
+        bot.user = types.SimpleNamespace(username="bot", id="me")
+        comment = FakeComment("@bot heavy hello world")
+        try:
+            result = await bot.command_manager.try_process_command(comment)
+        finally:
+            bot._shutdown_executors()
+        return result, comment.replies
+
+    result, replies = asyncio.run(run())
+    assert result == "HELLO WORLD"
+    assert replies == ["HELLO WORLD"]
+
+
+def test_timed_out_thread_keeps_its_slot():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow(ctx):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.pop()
+
+    async def run():
+        bot = Bot()
+        bot.user = types.SimpleNamespace(username="bot", id="me")
+        bot.command(max_concurrency=1, timeout=0.05)(slow)
+        await asyncio.gather(
+            *(
+                bot.command_manager.try_process_command(FakeComment("@bot slow"))
+                for _ in range(3)
+            )
+        )
+        # Let the last abandoned thread finish
+        await asyncio.sleep(0.3)
+        bot._shutdown_executors()
+
+    asyncio.run(run())
+    assert len(peak) == 3
+    assert max(peak) == 1
+
+
+def test_cache_hit_replays_replies_with_their_fields():
+    calls = []
+
+    async def greet(ctx):
+        calls.append(1)
+        await ctx.reply("hi", fields="minimal")
+
+    async def run():
+        bot = Bot()
+        bot.user = types.SimpleNamespace(username="bot", id="me")
+        bot.command(cache=60)(greet)
+        comments = [FakeComment("@bot greet") for _ in range(2)]
+        for comment in comments:
+            await bot.command_manager.try_process_command(comment)
+        bot._shutdown_executors()
+        return comments
+
+    comments = asyncio.run(run())
+    assert len(calls) == 1
+    for comment in comments:
+        assert comment.replies == ["hi"]
+        assert comment.fields == ["minimal"]
@@ -0,0 +1,29 @@
+import sys
+
+from rtlink.extensions import manifest
+
+
+def test_imported_commands_belong_to_their_own_extension(tmp_path, monkeypatch):
+    (tmp_path / "ext_shared.py").write_text(
+        "from rtlink import extensions\n"
+        "\n"
+        "@extensions.command()\n"
+        "def ping(ctx):\n"
+        "    pass\n"
+    )
+    (tmp_path / "ext_music.py").write_text(
+        "from rtlink import extensions\n"
+        "from ext_shared import ping\n"
+        "\n"
+        "@extensions.command()\n"
+        "def play(ctx):\n"
+        "    pass\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        commands = manifest("ext_shared", "ext_music")
+    finally:
+        sys.modules.pop("ext_shared", None)
+        sys.modules.pop("ext_music", None)
+    assert [c["options"]["name"] for c in commands["ext_shared"]] == ["ping"]
+    assert [c["options"]["name"] for c in commands["ext_music"]] == ["play"]
@@ -0,0 +1,41 @@
+import asyncio
+
+from rtlink import Bot
+
+
+def test_take_over_gives_up_on_a_hung_process(tmp_path):
+    path = str(tmp_path / "handoff.sock")
+
+    async def run():
+        async def hang(reader, writer):
+            await reader.readline()
+            await asyncio.Event().wait()
+
+        server = await asyncio.start_unix_server(hang, path)
+        bot = Bot(handoff_path=path, drain_timeout=0.1)
+        try:
+            await asyncio.wait_for(bot._take_over(), 2)
+        finally:
+            server.close()
+            bot._shutdown_executors()
+
+    asyncio.run(run())
+
+
+def test_take_over_marks_what_the_running_process_handled(tmp_path):
+    path = str(tmp_path / "handoff.sock")
+
+    async def run():
+        old, new = Bot(handoff_path=path), Bot(handoff_path=path)
+        old._mark_seen(["c1", "c2"])
+        await old._serve_handoff()
+        try:
+            await new._take_over()
+        finally:
+            for bot in (old, new):
+                bot._shutdown_executors()
+        return old, new
+
+    old, new = asyncio.run(run())
+    assert old.is_closed()
+    assert list(new._seen) == ["c1", "c2"]
@@ -0,0 +1,58 @@
+import asyncio
+
+from rtlink import Bot
+from rtlink.http import HTTPClient
+from rtlink.runner import SharedResources
+
+USER = {
+    "id": "u1",
+    "username": "alice",
+    "displayName": "Alice",
+    "createdAt": 0,
+    "modifiedAt": 0,
+    "admin": False,
+    "bot": False,
+}
+
+
+class FakeClient(HTTPClient):
+    """Answers getComment without a server, counting the requests."""
+
+    def __init__(self, **kwargs):
+        super().__init__("http://localhost/api", **kwargs)
+        self.requests = 0
+
+    async def _execute(self, document, variable_values=None):
+        self.requests += 1
+        comment = {"id": variable_values["id"], "content": "hi", "postId": "p1"}
+        return {"getComment": dict(comment, commenter=USER)}
+
+
+def test_comments_stay_out_of_the_shared_cache():
+    async def run():
+        shared = SharedResources()
+        first, second = FakeClient(), FakeClient()
+        first.use_shared(shared)
+        second.use_shared(shared)
+        await first.fetch_comment("c1")
+        assert await shared.cache.get("comment:c1") is None
+        assert await second.get_cached_comment("c1") is None
+
+        bot = Bot(client=second)
+        comment = await bot.fetch_comment("c1")
+        assert comment._client is second
+        assert (await bot.fetch_comment("c1")) is comment
+        assert second.requests == 1
+
+    asyncio.run(run())
+
+
+def test_cached_comments_expire():
+    async def run():
+        client = FakeClient(comment_cache_ttl=0)
+        bot = Bot(client=client)
+        await bot.fetch_comment("c1")
+        await bot.fetch_comment("c1")
+        assert client.requests == 2
+
+    asyncio.run(run())
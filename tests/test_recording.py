@@ -0,0 +1,82 @@
+import asyncio
+import wave
+
+import av
+import numpy as np
+from aiortc.mediastreams import MediaStreamError
+
+from rtlink.metrics import Metrics
+from rtlink.recording import Recorder, Sink
+
+
+class FakeTrack:
+    """Yields `frames` 20ms frames of silence, then ends."""
+
+    def __init__(self, frames=0):
+        self.frames = frames
+
+    async def recv(self):
+        if not self.frames:
+            raise MediaStreamError
+        self.frames -= 1
+        frame = av.AudioFrame.from_ndarray(
+            np.zeros((1, 1920), np.int16), format="s16", layout="stereo"
+        )
+        frame.sample_rate = 48000
+        return frame
+
+    def stop(self):
+        pass
+
+
+class FakeBot:
+    def __init__(self):
+        self.metrics = Metrics()
+        self.executor_calls = 0
+
+    async def run_in_executor(self, fn, *args):
+        self.executor_calls += 1
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+class SlowSink(Sink):
+    def __init__(self):
+        self.closed = False
+
+    async def write(self, pcm):
+        pass
+
+    async def close(self):
+        await asyncio.sleep(0.05)
+        self.closed = True
+
+
+def test_close_waits_for_replaced_streams():
+    async def run():
+        sinks = []
+        recorder = Recorder(lambda speaker: sinks.append(SlowSink()) or sinks[-1])
+        recorder.add("alice", FakeTrack())
+        recorder.add("alice", FakeTrack())
+        await recorder.close()
+        return sinks
+
+    assert [s.closed for s in asyncio.run(run())] == [True, True]
+
+
+def test_wav_sink_writes_through_the_bot_executor(tmp_path):
+    async def run():
+        bot = FakeBot()
+        recorder = Recorder(str(tmp_path))
+        recorder._set_bot(bot)
+        recorder.add("alice", FakeTrack(frames=3))
+        await asyncio.sleep(0.05)
+        await recorder.close()
+        return bot
+
+    bot = asyncio.run(run())
+    # Open, one write of everything buffered, close
+    assert bot.executor_calls == 3
+    assert bot.metrics.get("vc.recv.frames") == 3
+    (path,) = tmp_path.iterdir()
+    with wave.open(str(path)) as f:
+        assert f.getnframes() == 3 * 960
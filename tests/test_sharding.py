@@ -0,0 +1,70 @@
+import asyncio
+import random
+
+from rtlink.sharding import _PostOrder
+
+
+class RecordingBot:
+    """Starts a task per event like Bot._handle_event, with random handler latency."""
+
+    def __init__(self):
+        self.handled = []
+
+    def _spawn(self, coro):
+        return asyncio.ensure_future(coro)
+
+    def _handle_event(self, msg):
+        async def handle():
+            await asyncio.sleep(random.uniform(0, 0.01))
+            self.handled.append((msg["item"]["post_id"], msg["item"]["id"]))
+
+        return self._spawn(handle())
+
+
+def test_events_of_a_post_are_handled_in_order():
+    async def run():
+        bot = RecordingBot()
+        order = _PostOrder(bot, 8)
+        for i in range(30):
+            await order.submit(
+                {"event": "COMMENT_NEW", "item": {"id": i, "post_id": str(i % 3)}}
+            )
+        while order._queues:
+            await asyncio.sleep(0.01)
+        return bot.handled
+
+    handled = asyncio.run(run())
+    assert len(handled) == 30
+    for post in "012":
+        ids = [id for post_id, id in handled if post_id == post]
+        assert ids == sorted(ids)
+
+
+def test_submit_waits_for_a_free_slot():
+    async def run():
+        release = asyncio.Event()
+
+        class BlockedBot(RecordingBot):
+            def _handle_event(self, msg):
+                async def handle():
+                    await release.wait()
+                    self.handled.append(msg["item"]["id"])
+
+                return self._spawn(handle())
+
+        bot = BlockedBot()
+        order = _PostOrder(bot, 2)
+        await order.submit({"event": "COMMENT_NEW", "item": {"id": 0, "post_id": "a"}})
+        await order.submit({"event": "COMMENT_NEW", "item": {"id": 1, "post_id": "b"}})
+        third = asyncio.ensure_future(
+            order.submit({"event": "COMMENT_NEW", "item": {"id": 2, "post_id": "c"}})
+        )
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        release.set()
+        await asyncio.wait_for(third, 1)
+        while order._queues:
+            await asyncio.sleep(0.01)
+        return bot.handled
+
+    assert sorted(asyncio.run(run())) == [0, 1, 2]
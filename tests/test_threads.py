@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+from rtlink.threads import ThreadIndex
+
+
+def comment(id, created_at, reply_to=None):
+    return SimpleNamespace(
+        id=id, post_id="p1", reply_to=reply_to, created_at=created_at
+    )
+
+
+class FakeBot:
+    def __init__(self, *comments):
+        self.comments = {c.id: c for c in comments}
+
+    async def fetch_comment(self, id):
+        return self.comments.get(id)
+
+
+def test_fetched_parents_are_ordered_by_creation_time():
+    async def run():
+        index = ThreadIndex(per_post=3)
+        index._set_bot(FakeBot(comment("root", 1), comment("old", 2, "root")))
+        index.add(comment("a", 10, "root"))
+        index.add(comment("b", 11, "a"))
+        await index.fetch("old")
+        # Older than everything indexed, so it goes first and is the next one evicted
+        assert [c.id for c in index.recent("p1")] == ["old", "a", "b"]
+        index.add(comment("c", 12, "b"))
+        assert [c.id for c in index.recent("p1")] == ["a", "b", "c"]
+        assert "old" not in index
+
+        await index.fetch("root")
+        assert "root" not in index
+        assert [c.id for c in index.recent("p1", 2)] == ["b", "c"]
+
+    asyncio.run(run())
+
+
+def test_fetched_replies_are_ordered_among_siblings():
+    async def run():
+        index = ThreadIndex()
+        index._set_bot(FakeBot(comment("early", 5, "root")))
+        root = comment("root", 1)
+        index.add(root)
+        index.add(comment("late", 10, "root"))
+        await index.fetch("early")
+        assert [c.id for c in index.replies(root)] == ["early", "late"]
+
+    asyncio.run(run())
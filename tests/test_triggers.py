@@ -0,0 +1,20 @@
+from rtlink.triggers import TriggerSet, make_trigger
+
+
+def trigger_set(*regexes):
+    triggers = TriggerSet()
+    for regex in regexes:
+        triggers.add(make_trigger(lambda: None, [], regex, False, False))
+    return triggers
+
+
+def test_backreferences_survive_merging():
+    triggers = trigger_set(r"(x)\1", r"(y)\1", "hello")
+    assert [m.group() for _, m in triggers.match("yy")] == ["yy"]
+    assert [m.group() for _, m in triggers.match("xx hello")] == ["xx", "hello"]
+    assert triggers.match("xy") == []
+
+
+def test_named_backreferences_survive_merging():
+    triggers = trigger_set(r"(?P<a>x)(?P=a)", r"(?P<b>y)(?P=b)")
+    assert [m.group() for _, m in triggers.match("yy")] == ["yy"]